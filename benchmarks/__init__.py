@@ -0,0 +1,4 @@
+"""
+Benchmarks for quantulum3, run from the repository root with
+``python -m benchmarks.<name>``.
+"""
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Event loop responsiveness while parsing, inline versus quantulum3.aio.
+
+    python -m benchmarks.bench_async --documents 200 --executor process
+
+The regex engine holds the GIL, so on the regular build only a process
+executor keeps the loop fully responsive.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from quantulum3 import aio, batch, parser
+
+from . import corpus
+
+TICK = 0.001
+
+
+async def ticker(lags, stop):
+    """
+    Record how late the event loop wakes up a coroutine sleeping TICK seconds.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def inline(texts, executor, max_in_flight):
+    for text in texts:
+        parser.parse(text)
+        await asyncio.sleep(0)
+
+
+async def stream(texts, executor, max_in_flight):
+    async for _ in aio.parse_stream(
+        texts, executor=executor, max_in_flight=max_in_flight
+    ):
+        pass
+
+
+async def measure(mode, texts, executor, max_in_flight):
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, stop))
+    start = time.perf_counter()
+    await mode(texts, executor, max_in_flight)
+    seconds = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags.sort()
+    return (
+        len(texts) / seconds,
+        lags[len(lags) // 2] * 1000 if lags else 0.0,
+        lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        lags[-1] * 1000 if lags else 0.0,
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--documents", type=int, default=200)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--max-in-flight", type=int, default=aio.MAX_IN_FLIGHT)
+    arg_parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    args = arg_parser.parse_args()
+
+    texts = corpus.documents(args.documents)
+    batch.warmup()
+    print("%8s %10s %14s %14s %14s" % ("mode", "docs/s", "lag p50 (ms)", "lag p99 (ms)", "lag max (ms)"))
+    if args.executor == "process":
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers, initializer=batch.warmup
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+    with executor:
+        for name, mode in (("inline", inline), ("stream", stream)):
+            result = asyncio.run(measure(mode, texts, executor, args.max_in_flight))
+            print("%8s %10.1f %14.2f %14.2f %14.2f" % ((name,) + result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cost and effect of the optional stages of QuantityExtractor.
+
+Every stage is switched off in turn, then all of them at once. For each
+configuration the best time per pass over the fixed corpus and a synthetic
+corpus is compared with the full pipeline, along with the number of texts
+whose quantities change and the precision and recall on the synthetic
+corpus.
+
+    python -m benchmarks.bench_extractor
+    python -m benchmarks.bench_extractor --documents 200 --repeat 5
+"""
+
+import argparse
+import gc
+import time
+
+from quantulum3 import parser
+
+from . import corpus, synthetic
+
+
+###############################################################################
+def configurations():
+    """
+    :return: list of (name, keyword arguments of QuantityExtractor)
+    """
+    configs = [("all", {})]
+    configs += [("no " + stage, {stage: False}) for stage in parser.STAGES]
+    configs.append(("none", dict((stage, False) for stage in parser.STAGES)))
+    return configs
+
+
+def _quantities(extractor, text):
+    return [
+        (quantity.value, quantity.unit.name, quantity.span)
+        for quantity in extractor.parse(text)
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "--documents", type=int, default=50, help="synthetic documents"
+    )
+    arg_parser.add_argument("--length", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    documents = synthetic.Generator(args.seed).documents(args.documents, args.length)
+    texts = corpus.VI_SENTENCES + corpus.EN_SENTENCES
+    texts += [document["text"] for document in documents]
+
+    extractors = [
+        (name, parser.QuantityExtractor(**kwargs)) for name, kwargs in configurations()
+    ]
+    # Round robin, so drifting machine load hits all configurations alike
+    best = {}
+    for _ in range(args.repeat):
+        for name, extractor in extractors:
+            gc.collect()
+            start = time.perf_counter()
+            for text in texts:
+                extractor.parse(text)
+            seconds = time.perf_counter() - start
+            best[name] = min(best.get(name, seconds), seconds)
+
+    reference = None
+    print(
+        "%-16s %12s %8s %8s %10s %8s"
+        % ("stages", "time (ms)", "saving", "changed", "precision", "recall")
+    )
+    for name, extractor in extractors:
+        quantities = [_quantities(extractor, text) for text in texts]
+        if reference is None:
+            reference = quantities
+        changed = sum(1 for old, new in zip(reference, quantities) if old != new)
+        report = synthetic.evaluate(documents, parse=extractor.parse)
+        print(
+            "%-16s %12.2f %+7.1f%% %8d %10.3f %8.3f"
+            % (
+                name,
+                best[name] * 1000,
+                100 * (1 - best[name] / best["all"]),
+                changed,
+                report["precision"],
+                report["recall"],
+            )
+        )
+    print("%d texts, %d synthetic" % (len(texts), len(documents)))
+
+
+if __name__ == "__main__":
+    main()
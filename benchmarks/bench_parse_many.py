@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scaling of parser.parse_many with the number of workers.
+
+Run on both the regular and the free-threaded build of CPython:
+
+    python -m benchmarks.bench_parse_many --backend thread --max-workers 8
+
+On the regular build, use the process backend to scale across cores:
+
+    python -m benchmarks.bench_parse_many --backend process --chunk-size 16
+"""
+
+import argparse
+import os
+import sys
+
+from quantulum3 import batch
+
+from . import corpus
+
+
+def gil_enabled():
+    """
+    Whether this interpreter runs with the GIL.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def run(backend, max_workers, documents, repeat, chunk_size=None):
+    texts = corpus.documents(documents)
+    batch.warmup()
+    baseline = None
+    workers = 1
+    print(
+        "python %s, GIL %s, backend %s"
+        % (sys.version.split()[0], "enabled" if gil_enabled() else "disabled", backend)
+    )
+    print("%8s %12s %12s %8s" % ("workers", "docs/s", "chars/s", "speedup"))
+    while workers <= max_workers:
+        best = None
+        for _ in range(repeat):
+            stats = batch.BatchStats()
+            batch.parse_many(
+                texts,
+                workers=workers,
+                backend=backend,
+                stats=stats,
+                chunk_size=chunk_size,
+                compact_results=True,
+            )
+            if best is None or stats.throughput > best.throughput:
+                best = stats
+        baseline = baseline or best.throughput
+        print(
+            "%8d %12.1f %12.0f %8.2f"
+            % (workers, best.throughput, best.char_throughput, best.throughput / baseline)
+        )
+        workers *= 2
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--backend", default="thread", choices=batch.BACKENDS)
+    arg_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--documents", type=int, default=200)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--chunk-size", type=int, default=None)
+    args = arg_parser.parse_args()
+    run(args.backend, args.max_workers, args.documents, args.repeat, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pathological input suite, guarding parse() against superlinear run time.
+
+Every case repeats a short fragment (runs of digits, separators, spaces and
+unit-like letters) to a short and a long document. A case fails when parse()
+takes more than MAX_SECONDS_PER_CHAR or its time grows faster than
+MAX_EXPONENT with the length. Fragments in pathological.json are regressions
+found earlier and are always checked, those with "expected" quantities
+(value, unit name, surface) also fail when parse() finds others; --fuzz adds
+random fragments and --capture stores the failing ones.
+
+    python -m benchmarks.bench_pathological
+    python -m benchmarks.bench_pathological --fuzz 200 --seed 3 --capture
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+from quantulum3 import batch, parser
+
+CASES_PATH = Path(__file__).parent.joinpath("pathological.json")
+
+MAX_SECONDS_PER_CHAR = 1e-3
+MAX_EXPONENT = 1.35
+LENGTHS = (400, 1600)
+
+TOKENS = [
+    "1", "12", "0", ",", ".", " ", "-", "/", "^", "+", "±", "x", "·", "e",
+    "m", "km", "k", "g", "lít", " vuông", "hai ", "mươi ", "và ", "²", "½",
+    " đến ", "a", "$", "(", "'", '"', "\n", " lần ", " mỗi ", "s", "h",
+]
+
+
+###############################################################################
+def parse_time(text, repeat=3):
+    """
+    Best parse time of text in seconds, silencing parse warnings.
+    """
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parser.parse(text)
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def check(fragment, lengths=LENGTHS):
+    """
+    Measure a fragment repeated to each of the lengths.
+    :return: (seconds per character, growth exponent, passed)
+    """
+    times, sizes = [], []
+    for length in lengths:
+        text = fragment * max(1, length // len(fragment))
+        sizes.append(len(text))
+        times.append(parse_time(text))
+        # Stop early on inputs that are slow already
+        if times[-1] > MAX_SECONDS_PER_CHAR * len(text):
+            return times[-1] / len(text), float("inf"), False
+    per_char = times[-1] / sizes[-1]
+    exponent = math.log(max(times[-1], 1e-6) / max(times[0], 1e-6)) / math.log(
+        sizes[-1] / sizes[0]
+    )
+    passed = per_char <= MAX_SECONDS_PER_CHAR and exponent <= MAX_EXPONENT
+    return per_char, exponent, passed
+
+
+def unexpected(fragment, expected):
+    """
+    Quantities of fragment, or None if they are the expected ones.
+    """
+    quantities = [
+        [quantity.value, quantity.unit.name, quantity.surface]
+        for quantity in parser.parse(fragment)
+    ]
+    return None if quantities == expected else quantities
+
+
+def fuzz_fragments(count, seed):
+    rnd = random.Random(seed)
+    return [
+        "".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 4)))
+        for _ in range(count)
+    ]
+
+
+def load_cases():
+    with CASES_PATH.open("r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_cases(cases):
+    with CASES_PATH.open("w", encoding="utf-8") as file:
+        json.dump(cases, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+
+
+###############################################################################
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--fuzz", type=int, default=0, help="random fragments")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--capture", action="store_true", help="store failing fragments as cases"
+    )
+    args = arg_parser.parse_args()
+
+    batch.warmup()
+    cases = load_cases()
+    known = {case["fragment"] for case in cases}
+    fragments = [
+        (case["fragment"], case.get("note", ""), case.get("expected")) for case in cases
+    ]
+    fragments += [
+        (fragment, "fuzz seed %d" % args.seed, None)
+        for fragment in fuzz_fragments(args.fuzz, args.seed)
+        if fragment not in known
+    ]
+
+    failed = []
+    print("%-24s %12s %9s %s" % ("fragment", "s/char", "exponent", "result"))
+    for fragment, note, expected in fragments:
+        try:
+            per_char, exponent, passed = check(fragment)
+            found = None if expected is None else unexpected(fragment, expected)
+            if found is not None:
+                passed, note = False, "quantities %r" % found
+        except Exception as err:  # crashes are regressions too
+            per_char, exponent, passed = float("nan"), float("nan"), False
+            note = "%s: %r" % (type(err).__name__, err)
+        print(
+            "%-24r %12.2e %9.2f %s"
+            % (fragment, per_char, exponent, "ok" if passed else "FAIL " + note)
+        )
+        if not passed:
+            failed.append((fragment, note))
+
+    if args.capture:
+        new = [
+            {"fragment": fragment, "note": note}
+            for fragment, note in failed
+            if fragment not in known
+        ]
+        if new:
+            save_cases(cases + new)
+            print("captured %d new cases in %s" % (len(new), CASES_PATH))
+    if failed:
+        print("%d of %d cases failed" % (len(failed), len(fragments)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scaling of parse() with document length and quantity density.
+
+Documents of growing length are built from the fixed corpus, with a given
+share of sentences carrying quantities and filler sentences in between. For
+every density the growth exponent of the parse time, of the time of each
+stage and of the peak memory is fitted against the length. An exponent of 1
+is linear; the run fails when any of them exceeds --max-exponent.
+
+    python -m benchmarks.bench_scaling
+    python -m benchmarks.bench_scaling --lengths 2000 8000 32000 --density 1.0
+"""
+
+import argparse
+import gc
+import math
+import sys
+import time
+import tracemalloc
+
+from quantulum3 import parser, profiling
+
+from . import corpus
+
+LENGTHS = (2000, 8000, 32000)
+DENSITIES = (0.1, 0.5, 1.0)
+MAX_EXPONENT = 1.25
+# Stages taking less than this share of the parse time are too noisy to fit
+MIN_SHARE = 0.02
+
+FILLER = [
+    "Hôm nay trời đẹp và mọi người đi chơi.",
+    "Chúng tôi đã nói chuyện rất lâu về chuyện đó.",
+    "The weather was nice and everybody went out.",
+    "We talked about it for a long time.",
+]
+
+
+###############################################################################
+def document(length, density):
+    """
+    Deterministic document of about length characters, where density is the
+    share of sentences with quantities.
+    """
+    sentences = corpus.VI_SENTENCES + corpus.EN_SENTENCES
+    parts, size, index, owed = [], 0, 0, 0.0
+    while size < length:
+        owed += density
+        if owed >= 1.0:
+            owed -= 1.0
+            sentence = sentences[index % len(sentences)]
+        else:
+            sentence = FILLER[index % len(FILLER)]
+        index += 1
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+
+def exponent(sizes, values):
+    """
+    Least squares slope of log(values) against log(sizes).
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in values]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum(
+        (x - mean_x) ** 2 for x in xs
+    )
+
+
+def measure(text, repeat):
+    """
+    :return: (best parse time, stage self times of that parse, peak memory)
+    """
+    best, stages = None, None
+    for _ in range(repeat):
+        gc.collect()
+        with profiling.Profile() as profile:
+            start = time.perf_counter()
+            parser.parse(text)
+            seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best, stages = seconds, profile.as_dict()
+    gc.collect()
+    tracemalloc.start()
+    parser.parse(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, {name: values["self_seconds"] for name, values in stages.items()}, peak
+
+
+def run(lengths, density, repeat, max_exponent):
+    """
+    Print the timings of one density.
+    :return: list of (name, exponent) exceeding max_exponent
+    """
+    sizes, times, peaks, stage_times = [], [], [], {}
+    print("density %g" % density)
+    print("%10s %10s %12s %12s" % ("chars", "quantities", "time (ms)", "peak (KiB)"))
+    for length in lengths:
+        text = document(length, density)
+        seconds, stages, peak = measure(text, repeat)
+        sizes.append(len(text))
+        times.append(seconds)
+        peaks.append(peak)
+        for name, stage_seconds in stages.items():
+            stage_times.setdefault(name, []).append(stage_seconds)
+        print(
+            "%10d %10d %12.2f %12.1f"
+            % (len(text), len(parser.parse(text)), seconds * 1000, peak / 1024)
+        )
+
+    fits = [("parse", exponent(sizes, times)), ("memory", exponent(sizes, peaks))]
+    for name, values in sorted(stage_times.items()):
+        if len(values) == len(sizes) and values[-1] >= MIN_SHARE * times[-1]:
+            fits.append((name, exponent(sizes, values)))
+    print("  growth exponents: " + ", ".join("%s %.2f" % fit for fit in fits))
+    return [(name, value) for name, value in fits if value > max_exponent]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--lengths", type=int, nargs="+", default=list(LENGTHS))
+    arg_parser.add_argument(
+        "--density", type=float, action="append", default=None,
+        help="share of sentences with quantities, repeatable",
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT)
+    args = arg_parser.parse_args()
+
+    parser.parse("1 m")
+    failures = []
+    for density in args.density or DENSITIES:
+        for name, value in run(args.lengths, density, args.repeat, args.max_exponent):
+            failures.append("%s at density %g (%.2f)" % (name, density, value))
+    if failures:
+        print("Superlinear growth: " + ", ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Load test of quantulum3.server, reporting latency percentiles and throughput.
+
+    python -m benchmarks.bench_server --clients 16 --requests 2000 --workers 4
+    python -m benchmarks.bench_server --url http://127.0.0.1:8000
+
+Without --url a server is started on a free local port and stopped at the end.
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import corpus
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, max_batch, max_wait_ms):
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "quantulum3.server",
+            "--port", str(port),
+            "--workers", str(workers),
+            "--max-batch", str(max_batch),
+            "--max-wait-ms", str(max_wait_ms),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # The server prints its address once the data is loaded
+    process.stdout.readline()
+    return process
+
+
+def client(host, port, texts, timeout, latencies, codes):
+    """
+    Send one request per text over a keep-alive connection.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=timeout + 5)
+    for text in texts:
+        body = json.dumps({"text": text, "timeout": timeout})
+        start = time.perf_counter()
+        connection.request(
+            "POST", "/parse", body, {"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        codes[response.status] = codes.get(response.status, 0) + 1
+    connection.close()
+
+
+def run(host, port, texts, clients, timeout):
+    """
+    :return: (sorted latencies, status code counts, seconds)
+    """
+    latencies, codes = [], {}
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(host, port, texts[index::clients], timeout, latencies, codes),
+        )
+        for index in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), codes, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--url", default=None, help="server to test")
+    arg_parser.add_argument("--clients", type=int, default=16)
+    arg_parser.add_argument("--requests", type=int, default=2000)
+    arg_parser.add_argument(
+        "--sentences", type=int, default=1, help="sentences per document"
+    )
+    arg_parser.add_argument("--timeout", type=float, default=10.0)
+    arg_parser.add_argument("--workers", type=int, default=0)
+    arg_parser.add_argument("--max-batch", type=int, default=64)
+    arg_parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = arg_parser.parse_args()
+
+    process = None
+    if args.url:
+        address = urlsplit(args.url)
+        host, port = address.hostname, address.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        process = start_server(port, args.workers, args.max_batch, args.max_wait_ms)
+    try:
+        texts = corpus.documents(args.requests, args.sentences)
+        # Warm up connections and workers
+        run(host, port, texts[: args.clients], args.clients, args.timeout)
+        latencies, codes, seconds = run(host, port, texts, args.clients, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(
+        "%d requests, %d clients, %.2f s, %.1f req/s, status %s"
+        % (len(latencies), args.clients, seconds, len(latencies) / seconds, codes)
+    )
+    print(
+        "latency p50 %.2f ms, p99 %.2f ms, max %.2f ms"
+        % (
+            latencies[len(latencies) // 2] * 1000,
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            latencies[-1] * 1000,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks of the parse pipeline, one per stage, with regression checks.
+
+Every stage runs on the fixed Vietnamese and English corpora and reports its
+best time per pass over the corpus. With a baseline file, a stage slower than
+its baseline by more than the tolerance fails the run. Baselines depend on
+the machine, record them with --save before changing the code:
+
+    python -m benchmarks.bench_stages --save
+    python -m benchmarks.bench_stages --tolerance 0.2
+    python -m benchmarks.bench_stages --stage get_values --stage parse_vi
+
+The English corpus runs through the Vietnamese pipeline, the only language
+in the tree.
+"""
+
+import argparse
+import gc
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from quantulum3 import const, load, parser
+from quantulum3 import regex as reg
+
+from . import corpus
+
+BASELINE_PATH = Path(__file__).parent.joinpath("stages_baseline.json")
+LANG = "vi"
+TOLERANCE = 0.25
+CORPORA = {"vi": corpus.VI_SENTENCES, "en": corpus.EN_SENTENCES}
+
+
+###############################################################################
+def _matches(texts):
+    """
+    (original text, cleaned text, regex hit, shifts) of all non-empty unit
+    regex hits in texts.
+    """
+    items = []
+    for orig_text in texts:
+        text = parser.clean_text(orig_text, LANG)
+        values = parser.extract_spell_out_values(text, True, LANG)
+        text, shifts = parser.substitute_values(text, values)
+        for item in reg.units_regex(LANG).finditer(text):
+            if item.group():
+                items.append((orig_text, text, item, shifts))
+    return items
+
+
+def _quantity_args(texts):
+    """
+    Arguments of build_quantity for all regex hits that get that far.
+    """
+    args = []
+    for orig_text, text, item, shifts in _matches(texts):
+        try:
+            uncertain, values = parser.get_values(item, LANG)
+            unit, shortening = parser.get_unit(item, text)
+            surface, span = parser.get_surface(shifts, orig_text, item, text, shortening)
+        except ValueError:
+            continue
+        args.append((orig_text, text, item, values, unit, surface, span, uncertain))
+    return args
+
+
+def units_regex_build(texts):
+    def run():
+        re.purge()
+        reg.build_units_regex(LANG, True)
+
+    return run
+
+
+def text_pattern_reg_build(texts):
+    def run():
+        # Also compile the pattern, not just look it up in the re cache
+        re.purge()
+        reg.text_pattern_reg.__wrapped__(LANG)
+
+    return run
+
+
+def text_pattern_reg_scan(texts):
+    pattern = reg.text_pattern_reg(LANG)
+    return lambda: [list(pattern.finditer(text)) for text in texts]
+
+
+def extract_spell_out_values(texts):
+    cleaned = [parser.clean_text(text, LANG) for text in texts]
+    return lambda: [parser.extract_spell_out_values(text, True, LANG) for text in cleaned]
+
+
+def get_values(texts):
+    items = [item for _, _, item, _ in _matches(texts)]
+
+    def run():
+        for item in items:
+            try:
+                parser.get_values(item, LANG)
+            except ValueError:
+                pass
+
+    return run
+
+
+def get_unit(texts):
+    items = [(item, text) for _, text, item, _ in _matches(texts)]
+    return lambda: [parser.get_unit(item, text) for item, text in items]
+
+
+def build_quantity(texts):
+    args = _quantity_args(texts)
+    return lambda: [parser.build_quantity(*arg, lang=LANG) for arg in args]
+
+
+def get_unit_from_dimensions(texts):
+    dimensions = [
+        (arg[4].dimensions, arg[1]) for arg in _quantity_args(texts) if arg[4].dimensions
+    ]
+    return lambda: [
+        parser.get_unit_from_dimensions(dims, text, LANG) for dims, text in dimensions
+    ]
+
+
+def load_units(texts):
+    paths = [const.GENERAL_UNITS_PATH, const.LANG_UNITS_PATH, load.CUSTOM_UNITS]
+    return lambda: load.Units(paths, LANG)
+
+
+def parse(texts):
+    return lambda: [parser.parse(text, LANG) for text in texts]
+
+
+# Stages timed once per corpus, and stages independent of the corpus
+STAGES = {
+    "text_pattern_reg": text_pattern_reg_scan,
+    "extract_spell_out_values": extract_spell_out_values,
+    "get_values": get_values,
+    "get_unit": get_unit,
+    "build_quantity": build_quantity,
+    "get_unit_from_dimensions": get_unit_from_dimensions,
+    "parse": parse,
+}
+BUILD_STAGES = {
+    "units_regex_build": units_regex_build,
+    "text_pattern_reg_build": text_pattern_reg_build,
+    "load_units": load_units,
+}
+
+
+###############################################################################
+def benchmarks():
+    """
+    :return: dict of benchmark name to setup function and corpus
+    """
+    cases = {name: (setup, CORPORA["vi"]) for name, setup in BUILD_STAGES.items()}
+    for name, setup in STAGES.items():
+        for corpus_name, texts in CORPORA.items():
+            cases["%s_%s" % (name, corpus_name)] = (setup, texts)
+    return cases
+
+
+def measure(run, repeat, min_seconds=0.05):
+    """
+    Best time of a call to run in seconds, calling it often enough per
+    repetition to last min_seconds.
+    """
+    run()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        seconds = time.perf_counter() - start
+        if seconds >= min_seconds:
+            break
+        number *= 2
+    best = seconds / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: names of the benchmarks slower than baseline * (1 + tolerance)
+    """
+    return [
+        name
+        for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + tolerance)
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "--stage", action="append", default=None, help="benchmarks to run, default all"
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    arg_parser.add_argument(
+        "--tolerance", type=float, default=TOLERANCE,
+        help="allowed slowdown against the baseline, 0.25 is 25 %%",
+    )
+    arg_parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    args = arg_parser.parse_args()
+
+    cases = benchmarks()
+    unknown = set(args.stage or ()) - set(cases)
+    if unknown:
+        arg_parser.error("unknown benchmarks %s" % ", ".join(sorted(unknown)))
+    baseline = {}
+    if Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+
+    parser.parse("", LANG)
+    results = {}
+    print("%-32s %12s %12s %8s" % ("benchmark", "time (ms)", "baseline", "change"))
+    for name, (setup, texts) in cases.items():
+        if args.stage and name not in args.stage:
+            continue
+        gc.collect()
+        results[name] = seconds = measure(setup(texts), args.repeat)
+        if name in baseline:
+            print(
+                "%-32s %12.4f %12.4f %+7.1f%%"
+                % (name, seconds * 1000, baseline[name] * 1000,
+                   100 * (seconds / baseline[name] - 1))
+            )
+        else:
+            print("%-32s %12.4f %12s %8s" % (name, seconds * 1000, "-", "-"))
+
+    if args.save:
+        baseline.update(results)
+        Path(args.baseline).write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+        print("Baseline written to %s" % args.baseline)
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(
+            "Slower than the baseline by more than %g %%: %s"
+            % (100 * args.tolerance, ", ".join(regressions))
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Unit mentions without values, UnitTagger against parse with has_value=False.
+
+Both run over the fixed corpus and a synthetic corpus, reporting the best
+time per pass, the mentions found and the texts they fail on. On the
+synthetic corpus, precision is the share of mentions on an annotated
+quantity with its dimensions, recall the share of annotated quantities
+found so.
+Then both run over documents of growing length and the growth exponent of
+their times is fitted as in bench_scaling. The run fails when the exponent
+of the tagger exceeds --max-exponent.
+
+    python -m benchmarks.bench_units_only
+    python -m benchmarks.bench_units_only --lengths 2000 8000 32000 128000
+"""
+
+import argparse
+import gc
+import sys
+import time
+
+from quantulum3 import parser, tagger
+
+from . import bench_scaling, corpus, synthetic
+
+LENGTHS = (2000, 8000, 32000)
+MAX_EXPONENT = 1.25
+
+
+###############################################################################
+def engines():
+    """
+    :return: list of (name, function of a text returning its mentions)
+    """
+    unit_tagger = tagger.UnitTagger()
+    return [
+        ("parse(has_value=False)", lambda text: parser.parse(text, has_value=False)),
+        ("UnitTagger", unit_tagger.tag),
+    ]
+
+
+def run(find, text):
+    """
+    :return: mentions of the text, None if finding them fails
+    """
+    try:
+        return find(text)
+    except Exception:
+        return None
+
+
+def best_time(find, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for text in texts:
+            run(find, text)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def matches(mention, truth):
+    """
+    Whether a mention overlaps an annotated quantity with its dimensions.
+    """
+    first, last = truth["span"]
+    return (
+        mention.span[0] < last
+        and mention.span[1] > first
+        and sorted((part["base"], part["power"]) for part in mention.unit.dimensions)
+        == sorted(tuple(part) for part in truth["dimensions"])
+    )
+
+
+def unit_scores(find, documents):
+    """
+    :return: (precision, recall) of the mentions against the annotated
+             quantities of the documents
+    """
+    found, relevant, expected, recalled = 0, 0, 0, 0
+    for document in documents:
+        mentions = run(find, document["text"]) or []
+        truths = document["quantities"]
+        found += len(mentions)
+        relevant += sum(
+            any(matches(mention, truth) for truth in truths) for mention in mentions
+        )
+        expected += len(truths)
+        recalled += sum(
+            any(matches(mention, truth) for mention in mentions) for truth in truths
+        )
+    return relevant / (found or 1), recalled / (expected or 1)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "--documents", type=int, default=50, help="synthetic documents"
+    )
+    arg_parser.add_argument("--length", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--lengths", type=int, nargs="+", default=list(LENGTHS))
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT)
+    args = arg_parser.parse_args()
+
+    documents = synthetic.Generator(args.seed).documents(args.documents, args.length)
+    texts = corpus.VI_SENTENCES + corpus.EN_SENTENCES
+    texts += [document["text"] for document in documents]
+    finders = engines()
+    for _, find in finders:
+        run(find, "1 m")
+
+    print(
+        "%-24s %12s %10s %8s %10s %8s"
+        % ("engine", "time (ms)", "mentions", "failed", "precision", "recall")
+    )
+    for name, find in finders:
+        results = [run(find, text) for text in texts]
+        print(
+            "%-24s %12.2f %10d %8d %10.3f %8.3f"
+            % (
+                (
+                    name,
+                    best_time(find, texts, args.repeat) * 1000,
+                    sum(len(result) for result in results if result is not None),
+                    sum(1 for result in results if result is None),
+                )
+                + unit_scores(find, documents)
+            )
+        )
+    print("%d texts, %d synthetic" % (len(texts), len(documents)))
+
+    print()
+    print("%10s %24s %24s" % ("chars", finders[0][0], finders[1][0]))
+    sizes, times = [], dict((name, []) for name, _ in finders)
+    for length in args.lengths:
+        text = bench_scaling.document(length, 1.0)
+        sizes.append(len(text))
+        for name, find in finders:
+            times[name].append(best_time(find, [text], args.repeat))
+        print(
+            "%10d %21.2f ms %21.2f ms"
+            % tuple([len(text)] + [times[name][-1] * 1000 for name, _ in finders])
+        )
+    fits = [(name, bench_scaling.exponent(sizes, times[name])) for name, _ in finders]
+    print("growth exponents: " + ", ".join("%s %.2f" % fit for fit in fits))
+    if fits[-1][1] > args.max_exponent:
+        print("Superlinear growth of the tagger (%.2f)" % fits[-1][1])
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Windowed parsing, parse_large and parse_file against parse.
+
+Both run over documents of growing length built as in bench_scaling, and over
+documents of multibyte characters without whitespace, whose windows have to
+be cut between characters. The run fails when their quantities differ from
+those of parse or when they raise.
+
+    python -m benchmarks.bench_windows
+    python -m benchmarks.bench_windows --window 4096 --overlap 64
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from quantulum3 import chunking, parser
+
+from . import bench_scaling
+
+LENGTHS = (2000, 8000, 32000)
+
+
+###############################################################################
+def documents(lengths):
+    """
+    :return: list of (name, text)
+    """
+    texts = [
+        ("scaling %d" % length, bench_scaling.document(length, 0.5))
+        for length in lengths
+    ]
+    texts.append(("no spaces", ("5 m. " + "数" * 2000 + "\n") * 60))
+    texts.append(("no spaces vi", ("giá 3 kg " + "đ" * 3000) * 20))
+    return texts
+
+
+def summary(quantities):
+    return [
+        (quantity.value, quantity.unit.name, quantity.surface, quantity.span)
+        for quantity in quantities
+    ]
+
+
+def timed(function, *args, **kwargs):
+    """
+    :return: (result, seconds), result is the exception if function raises
+    """
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    except Exception as error:
+        result = error
+    return result, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--lengths", type=int, nargs="+", default=list(LENGTHS))
+    arg_parser.add_argument("--window", type=int, default=chunking.WINDOW_SIZE)
+    arg_parser.add_argument("--overlap", type=int, default=chunking.OVERLAP)
+    args = arg_parser.parse_args()
+
+    parser.parse("1 m")
+    options = dict(window=args.window, overlap=args.overlap)
+    print(
+        "%-16s %10s %12s %12s %12s  %s"
+        % ("document", "chars", "parse", "parse_large", "parse_file", "result")
+    )
+    failures = []
+    for name, text in documents(args.lengths):
+        expected, seconds = timed(parser.parse, text)
+        large, large_seconds = timed(parser.parse_large, text, **options)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False) as file:
+            file.write(text)
+        try:
+            read, file_seconds = timed(parser.parse_file, file.name, **options)
+        finally:
+            os.remove(file.name)
+
+        problems = []
+        for label, result in (("parse_large", large), ("parse_file", read)):
+            if isinstance(result, Exception):
+                problems.append("%s raises %s" % (label, type(result).__name__))
+            elif summary(result) != summary(expected):
+                problems.append("%s differs" % label)
+        failures += ["%s: %s" % (name, problem) for problem in problems]
+        print(
+            "%-16s %10d %9.2f ms %9.2f ms %9.2f ms  %s"
+            % (
+                name,
+                len(text),
+                seconds * 1000,
+                large_seconds * 1000,
+                file_seconds * 1000,
+                ", ".join(problems) or "ok",
+            )
+        )
+    if failures:
+        print("Windowed parsing differs: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Fixed corpora used by the benchmarks.
+"""
+
+VI_SENTENCES = [
+    "Tôi muốn mua 2 lít nước và 500 g đường.",
+    "Xe chạy với tốc độ 60 km/h trên quãng đường dài hai mươi km.",
+    "Căn phòng rộng 25 m² và cao 3,2 m.",
+    "Giá vàng hôm nay là 67 triệu đồng mỗi lượng.",
+    "Nhiệt độ ngoài trời lên tới 38 °C vào buổi trưa.",
+    "Bể chứa có dung tích từ 10 m³ đến 12 m³.",
+    "Con cá nặng khoảng ba kg, dài 45 cm.",
+    "Chiếc điện thoại có pin 4000 mAh và sạc nhanh 25 W.",
+    "Khoảng cách giữa hai thành phố là 1.700 km.",
+    "Mỗi ngày cần uống một phần hai lít sữa.",
+]
+
+EN_SENTENCES = [
+    "I want 2 liters of wine and 500 g of cheese.",
+    "The car was driving at 60 km/h for twenty km.",
+    "The room is 25 m² wide and 3.2 m high.",
+    "The LHC smashes proton beams at 12.8-13.0 TeV.",
+    "Sound travels at 0.34 km/s in air.",
+    "The tank holds between 10 m³ and 12 m³ of water.",
+    "The fish weighs about 3 kg and is 45 cm long.",
+    "The phone has a 4000 mAh battery and 25 W charging.",
+    "The distance between the cities is 1,700 km.",
+    "He paid $20/h for 5.5 hours of work.",
+]
+
+
+def documents(count, sentences_per_document=10, sentences=None):
+    """
+    Build count documents by cycling through the given sentences.
+    """
+    sentences = sentences or VI_SENTENCES + EN_SENTENCES
+    docs = []
+    index = 0
+    for _ in range(count):
+        doc = []
+        for _ in range(sentences_per_document):
+            doc.append(sentences[index % len(sentences)])
+            index += 1
+        docs.append(" ".join(doc))
+    return docs
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Deterministic synthetic corpus with ground truth, for measuring speed and
+accuracy together.
+
+Sentences are built from the loaded unit surfaces and symbols, the spelled
+out number words, ranges, uncertainties, unicode fractions and powers,
+compound units and currency prefixes. Every document carries the expected
+span, value, uncertainty and unit dimensions of its quantities. The same
+seed and options always give the same corpus.
+
+    python -m benchmarks.synthetic --documents 100 --seed 1 -o corpus.jsonl
+    python -m benchmarks.synthetic --documents 200 --density 0.8 --evaluate
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+
+from quantulum3 import load, parser
+from quantulum3 import regex as reg
+
+KINDS = (
+    "number", "decimal", "spelled", "range", "uncertainty", "fraction", "power",
+    "compound", "currency",
+)
+
+FRAMES = {
+    "vi": [
+        "Theo báo cáo, con số đo được là {q}.",
+        "Chiếc hộp này có {q} theo ghi chép.",
+        "Kết quả cuối cùng đạt {q} sau nhiều lần thử.",
+        "Họ ghi nhận {q} và {q} trong ngày hôm qua.",
+        "Mỗi lần kiểm tra cho thấy khoảng {q}.",
+    ],
+    "en": [
+        "According to the report, the measured figure was {q}.",
+        "This box holds {q} according to the notes.",
+        "The final result reached {q} after several attempts.",
+        "They recorded {q} and {q} yesterday.",
+        "Every check showed about {q}.",
+    ],
+}
+FILLER = {
+    "vi": [
+        "Hôm nay trời đẹp và mọi người đi chơi.",
+        "Chúng tôi đã nói chuyện rất lâu về chuyện đó.",
+        "Cuộc họp kết thúc sớm hơn dự kiến.",
+    ],
+    "en": [
+        "The weather was nice and everybody went out.",
+        "We talked about it for a long time.",
+        "The meeting ended earlier than planned.",
+    ],
+}
+RANGE_WORDS = {"vi": " đến ", "en": "-"}
+# Spelled out numbers, only digits whose words are in reg.number_words
+DIGIT_WORDS = ["một", "hai", "ba", "bốn", "sáu", "bảy", "tám", "chín"]
+DIGIT_VALUES = [1, 2, 3, 4, 6, 7, 8, 9]
+POWERS = {2: "²", 3: "³"}
+SKIPPED_ENTITIES = ("dimensionless", "unknown", "currency")
+# Units used as the denominator of compound units
+DENOMINATOR_ENTITIES = ("time", "length", "mass", "volume")
+
+
+###############################################################################
+def _clean(surface):
+    """
+    Whether a surface or symbol is usable in generated text.
+    """
+    return len(surface) >= 1 and not re.search(r"[\d/^()\s_.,-]", surface)
+
+
+class Generator(object):
+    """
+    Seeded generator of documents with annotated quantities.
+    :param density: share of sentences with quantities
+    :param en_share: share of sentences with English frames
+    :param kinds: kinds of quantities to generate, see KINDS
+    """
+
+    def __init__(self, seed=0, density=0.5, en_share=0.3, kinds=KINDS, lang="vi"):
+
+        self.random = random.Random(seed)
+        self.density = density
+        self.en_share = en_share
+        self.kinds = list(kinds)
+        self.lang = lang
+        units = load.units(lang)
+
+        def owners(text):
+            return units.symbols_all.get(text, set()) | units.surfaces_all.get(
+                text, set()
+            )
+
+        # (mention, unit) pairs whose mention names exactly one unit
+        self.mentions, self.symbols = [], []
+        for name in sorted(units.names):
+            unit = units.names[name]
+            if unit.entity.name in SKIPPED_ENTITIES or len(unit.dimensions) != 1:
+                continue
+            for mention in sorted(set(unit.symbols) | set(unit.surfaces)):
+                if _clean(mention) and owners(mention) == {unit}:
+                    self.mentions.append((mention, unit))
+                    if mention in unit.symbols and unit.dimensions[0]["power"] == 1:
+                        self.symbols.append((mention, unit))
+        self.denominators = [
+            (mention, unit)
+            for mention, unit in self.symbols
+            if unit.entity.name in DENOMINATOR_ENTITIES
+        ]
+        self.powered = [
+            (mention, unit) for mention, unit in self.symbols if unit.entity.name == "length"
+        ]
+        self.currencies = [
+            (symbol, next(iter(owners(symbol))))
+            for symbol in sorted(units.prefix_symbols)
+            if not re.search(r"\w", symbol) and len(owners(symbol)) == 1
+        ]
+        self.fractions = sorted(reg.unicode_fractions().items())
+
+    ###########################################################################
+    def _number(self):
+        return self.random.choice([self.random.randint(1, 99), self.random.randint(100, 9999)])
+
+    def _decimal(self):
+        digits = self.random.randint(1, 3)
+        return round(self.random.uniform(0.1, 999), digits), digits
+
+    def _spelled(self):
+        """
+        :return: (spelled out number, value)
+        """
+        form = self.random.randrange(4)
+        index = self.random.randrange(len(DIGIT_WORDS))
+        word, value = DIGIT_WORDS[index], DIGIT_VALUES[index]
+        if form == 0:
+            return word, value
+        if form == 1 and value > 1:
+            return "%s mươi" % word, value * 10
+        if form == 2:
+            return "%s trăm" % word, value * 100
+        return "%s nghìn" % word, value * 1000
+
+    @staticmethod
+    def _dimensions(unit, power=1):
+        return [[part["base"], part["power"] * power] for part in unit.dimensions]
+
+    def quantity(self, lang):
+        """
+        :return: (surface, annotation without span)
+        """
+        kind = self.random.choice(self.kinds)
+        mention, unit = self.random.choice(self.mentions)
+        value, uncertainty = None, None
+        dimensions = self._dimensions(unit)
+        if kind == "number":
+            value = self._number()
+            surface = "%d %s" % (value, mention)
+        elif kind == "decimal":
+            value, digits = self._decimal()
+            surface = "%.*f %s" % (digits, value, mention)
+        elif kind == "spelled" and lang == "vi":
+            words, value = self._spelled()
+            surface = "%s %s" % (words, mention)
+        elif kind == "range":
+            low = self.random.randint(1, 500)
+            high = low + self.random.randint(1, 100)
+            value, uncertainty = (low + high) / 2, (high - low) / 2
+            surface = "%d%s%d %s" % (low, RANGE_WORDS[lang], high, mention)
+        elif kind == "uncertainty":
+            value = self._number()
+            uncertainty = self.random.choice([0.5, 1, 2, 5])
+            surface = "%d ± %g %s" % (value, uncertainty, mention)
+        elif kind == "fraction":
+            character, fraction = self.random.choice(self.fractions)
+            numerator, denominator = fraction.split("/")
+            value = int(numerator) / int(denominator)
+            surface = "%s %s" % (character, mention)
+        elif kind == "power" and self.powered:
+            mention, unit = self.random.choice(self.powered)
+            power = self.random.choice(sorted(POWERS))
+            value = self._number()
+            dimensions = self._dimensions(unit, power)
+            surface = "%d %s%s" % (value, mention, POWERS[power])
+        elif kind == "compound" and self.symbols and self.denominators:
+            mention, unit = self.random.choice(self.symbols)
+            other, other_unit = self.random.choice(self.denominators)
+            if other_unit is unit:
+                return self.quantity(lang)
+            value = self._number()
+            dimensions = self._dimensions(unit) + self._dimensions(other_unit, -1)
+            surface = "%d %s/%s" % (value, mention, other)
+        elif kind == "currency" and self.currencies:
+            mention, unit = self.random.choice(self.currencies)
+            value = self._number()
+            dimensions = self._dimensions(unit)
+            surface = "%s%d" % (mention, value)
+        else:
+            value = self._number()
+            kind = "number"
+            surface = "%d %s" % (value, mention)
+        return surface, {
+            "kind": kind,
+            "surface": surface,
+            "value": value,
+            "uncertainty": uncertainty,
+            "unit": None if kind in ("power", "compound") else unit.name,
+            "dimensions": dimensions,
+        }
+
+    def sentence(self):
+        """
+        :return: (sentence, annotations with spans within the sentence)
+        """
+        lang = "en" if self.random.random() < self.en_share else "vi"
+        if self.random.random() >= self.density:
+            return self.random.choice(FILLER[lang]), []
+        frame = self.random.choice(FRAMES[lang])
+        pieces, annotations, size = [], [], 0
+        for index, part in enumerate(frame.split("{q}")):
+            if index:
+                surface, annotation = self.quantity(lang)
+                annotation["span"] = [size, size + len(surface)]
+                annotations.append(annotation)
+                pieces.append(surface)
+                size += len(surface)
+            pieces.append(part)
+            size += len(part)
+        return "".join(pieces), annotations
+
+    def document(self, length=1000):
+        """
+        Document of at least length characters.
+        :return: {"text": ..., "quantities": [annotation, ...]}
+        """
+        pieces, quantities, size = [], [], 0
+        while size < length:
+            if pieces:
+                pieces.append(" ")
+                size += 1
+            text, annotations = self.sentence()
+            for annotation in annotations:
+                annotation["span"] = [annotation["span"][0] + size, annotation["span"][1] + size]
+                quantities.append(annotation)
+            pieces.append(text)
+            size += len(text)
+        return {"text": "".join(pieces), "quantities": quantities}
+
+    def documents(self, count, length=1000):
+        return [self.document(length) for _ in range(count)]
+
+
+###############################################################################
+def _matches(truth, quantity):
+    """
+    Whether a parsed quantity has the expected value, uncertainty and unit.
+    """
+    if not math.isclose(quantity.value, truth["value"], rel_tol=1e-6):
+        return False
+    if (truth["uncertainty"] or 0) != (quantity.uncertainty or 0):
+        return False
+    expected = sorted(tuple(part) for part in truth["dimensions"])
+    found = sorted((part["base"], part["power"]) for part in quantity.unit.dimensions)
+    return expected == found
+
+
+def evaluate(documents, lang="vi", parse=None):
+    """
+    Parse the documents and compare the quantities to the annotations. A
+    quantity is found when a parsed quantity overlaps its span, and correct
+    when that quantity also has the expected value and unit.
+    :param parse: function of a text returning its quantities, by default
+                  parser.parse in lang
+    :return: dict of counts, precision, recall, throughput and recall per kind
+    """
+    report = {"documents": len(documents), "characters": 0, "seconds": 0.0,
+              "expected": 0, "parsed": 0, "found": 0, "correct": 0, "kinds": {}}
+    for document in documents:
+        text = document["text"]
+        start = time.perf_counter()
+        quantities = parser.parse(text, lang) if parse is None else parse(text)
+        report["seconds"] += time.perf_counter() - start
+        report["characters"] += len(text)
+        report["expected"] += len(document["quantities"])
+        report["parsed"] += len(quantities)
+        for truth in document["quantities"]:
+            first, last = truth["span"]
+            overlapping = [
+                quantity for quantity in quantities
+                if quantity.span[0] < last and quantity.span[1] > first
+            ]
+            kind = report["kinds"].setdefault(truth["kind"], [0, 0])
+            kind[0] += 1
+            if overlapping:
+                report["found"] += 1
+            if any(_matches(truth, quantity) for quantity in overlapping):
+                report["correct"] += 1
+                kind[1] += 1
+    report["precision"] = report["correct"] / (report["parsed"] or 1)
+    report["recall"] = report["correct"] / (report["expected"] or 1)
+    report["docs_per_second"] = report["documents"] / (report["seconds"] or 1)
+    report["chars_per_second"] = report["characters"] / (report["seconds"] or 1)
+    return report
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--documents", type=int, default=100)
+    arg_parser.add_argument("--length", type=int, default=1000, help="characters per document")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--density", type=float, default=0.5, help="share of sentences with quantities"
+    )
+    arg_parser.add_argument(
+        "--en-share", type=float, default=0.3, help="share of English sentences"
+    )
+    arg_parser.add_argument("--kind", action="append", choices=KINDS, default=None)
+    arg_parser.add_argument("-o", "--output", default=None, help="JSONL output file")
+    arg_parser.add_argument(
+        "--evaluate", action="store_true", help="parse the corpus and report accuracy"
+    )
+    args = arg_parser.parse_args()
+
+    generator = Generator(args.seed, args.density, args.en_share, args.kind or KINDS)
+    documents = generator.documents(args.documents, args.length)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            for document in documents:
+                file.write(json.dumps(document, ensure_ascii=False) + "\n")
+    elif not args.evaluate:
+        for document in documents:
+            sys.stdout.write(json.dumps(document, ensure_ascii=False) + "\n")
+    if args.evaluate:
+        parser.parse("1 m")
+        report = evaluate(documents)
+        print(
+            "%d documents, %d chars, %.1f docs/s, %.0f chars/s"
+            % (report["documents"], report["characters"], report["docs_per_second"],
+               report["chars_per_second"])
+        )
+        print(
+            "%d expected, %d parsed, %d found, %d correct, precision %.3f, recall %.3f"
+            % (report["expected"], report["parsed"], report["found"], report["correct"],
+               report["precision"], report["recall"])
+        )
+        for kind, (expected, correct) in sorted(report["kinds"].items()):
+            print("  %-12s %5d expected, recall %.3f" % (kind, expected, correct / expected))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,13 @@ __copyright__ = "Copyright (C) 2016 Marco Lagi, nielstron,t sohrabtowfighi, "
 "grhawk and Rodrigo Castro"
 __license__ = "MIT"
 __url__ = "https://github.com/nielstron/quantulum3"
+
+
+def prefork_warmup(langs=None):
+    """
+    Load and compile everything for the given languages and freeze the
+    garbage collector before forking workers, see batch.prefork_warmup.
+    """
+    from . import batch
+
+    batch.prefork_warmup(langs)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` command line, extracting quantities from many documents.
+
+    python -m quantulum3 documents.txt.gz > quantities.jsonl
+    python -m quantulum3 --jsonl --workers 8 --normalize-si < records.jsonl
+
+Every input line is a document, or with --jsonl a JSON record holding the
+document in its text field. One JSON line is written per input line, in
+input order. Documents are read and parsed in batches, so memory stays
+bounded for inputs of any size. A summary is printed to stderr.
+"""
+
+import argparse
+import sys
+import time
+
+from . import batch, const, jsonl, metrics, profiling, slowlog
+
+
+###############################################################################
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m quantulum3",
+        description="Extract quantities from documents, one JSON line per input line",
+    )
+    arg_parser.add_argument(
+        "inputs", nargs="*", default=["-"],
+        help="text or JSONL files, optionally gzip compressed, - for stdin",
+    )
+    arg_parser.add_argument("-o", "--output", default="-", help="JSONL output file")
+    arg_parser.add_argument(
+        "--jsonl", action="store_true", help="inputs are JSON records per line"
+    )
+    arg_parser.add_argument(
+        "--field", default="text", help="field of the JSON records holding the text"
+    )
+    arg_parser.add_argument("--lang", default=const.LANG)
+    arg_parser.add_argument(
+        "--has-value", action=argparse.BooleanOptionalAction, default=True,
+        help="extract quantities with values, or bare units",
+    )
+    arg_parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes, 1 parses serially"
+    )
+    arg_parser.add_argument(
+        "--backend", choices=batch.BACKENDS, default=None,
+        help="defaults to process with more than one worker",
+    )
+    arg_parser.add_argument(
+        "--chunk-size", type=int, default=None,
+        help="documents sent to a worker process at once",
+    )
+    arg_parser.add_argument(
+        "--batch-size", type=int, default=jsonl.BATCH_SIZE,
+        help="documents held in memory at once",
+    )
+    arg_parser.add_argument(
+        "--timeout", type=float, default=None, help="time budget per document in seconds"
+    )
+    arg_parser.add_argument(
+        "--normalize-si", action="store_true",
+        help="add the value converted to the SI unit",
+    )
+    arg_parser.add_argument(
+        "--profile", action="store_true",
+        help="print the time spent in each parse stage",
+    )
+    arg_parser.add_argument(
+        "--slow-log", default=None,
+        help="JSONL file capturing slow documents, see python -m quantulum3.slowlog",
+    )
+    arg_parser.add_argument(
+        "--slow-threshold", type=float, default=slowlog.THRESHOLD,
+        help="parse time in seconds from which documents are captured",
+    )
+    args = arg_parser.parse_args(argv)
+    backend = args.backend or ("process" if args.workers > 1 else "serial")
+
+    stats = batch.BatchStats()
+    latencies = metrics.LatencyHistogram()
+    profile = profiling.Profile() if args.profile else None
+    slow_log = (
+        slowlog.SlowLog(args.slow_log, args.slow_threshold) if args.slow_log else None
+    )
+    start = time.perf_counter()
+    documents = jsonl.read_documents(args.inputs, args.jsonl, args.field)
+    with jsonl.open_file(args.output, "w") as output:
+        errors = jsonl.extract(
+            documents,
+            output,
+            args.lang,
+            args.has_value,
+            field=args.field,
+            normalize_si=args.normalize_si,
+            batch_size=args.batch_size,
+            stats=stats,
+            latencies=latencies,
+            workers=args.workers,
+            backend=backend,
+            chunk_size=args.chunk_size,
+            timeout=args.timeout,
+            profile=profile,
+            slow_log=slow_log,
+        )
+    seconds = time.perf_counter() - start
+    print(jsonl.summary(stats, latencies, errors, seconds), file=sys.stderr)
+    if profile is not None:
+        print(profile.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
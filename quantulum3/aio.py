@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` asyncio functions.
+"""
+
+import asyncio
+import functools
+from collections import deque
+
+from . import const, parser
+
+# Default number of documents being parsed at the same time by parse_stream
+MAX_IN_FLIGHT = 8
+
+
+###############################################################################
+async def parse_async(text, lang=const.LANG, has_value=True, executor=None):
+    """
+    Extract all quantities from unstructured text without blocking the
+    event loop.
+    :param executor: concurrent.futures executor running the parse, defaults
+                     to the default executor of the loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(parser.parse, text, lang, has_value)
+    )
+
+
+async def _aiter(texts):
+    """
+    Iterate over a synchronous or asynchronous iterable.
+    """
+    if hasattr(texts, "__aiter__"):
+        async for text in texts:
+            yield text
+    else:
+        for text in texts:
+            yield text
+
+
+async def parse_stream(
+    texts, lang=const.LANG, has_value=True, executor=None, max_in_flight=MAX_IN_FLIGHT
+):
+    """
+    Extract all quantities from a stream of texts, yielding the quantities of
+    each text in input order.
+    At most max_in_flight texts are parsed at the same time, no further text
+    is taken from the producer until the oldest one is done. Closing or
+    cancelling the generator cancels the pending parses.
+    :param texts: iterable or asynchronous iterable of texts
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight has to be at least 1")
+    loop = asyncio.get_running_loop()
+    in_flight = deque()
+    try:
+        async for text in _aiter(texts):
+            in_flight.append(
+                loop.run_in_executor(
+                    executor, functools.partial(parser.parse, text, lang, has_value)
+                )
+            )
+            if len(in_flight) >= max_in_flight:
+                yield await in_flight.popleft()
+        while in_flight:
+            yield await in_flight.popleft()
+    finally:
+        for future in in_flight:
+            future.cancel()
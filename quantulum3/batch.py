@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` batch parsing functions.
+"""
+
+import contextlib
+import copy
+import gc
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from . import classes as cls
+from . import const, load, metrics, parser, profiling
+from . import regex as reg
+
+BACKENDS = ("serial", "thread", "process")
+
+# Cheaply picklable representation of a Quantity, dimensions are tuples of
+# base, power and surface, None for dimensions without one
+CompactQuantity = namedtuple(
+    "CompactQuantity",
+    ["value", "unit", "entity", "dimensions", "surface", "span", "uncertainty"],
+)
+
+
+###############################################################################
+class BatchStats(object):
+    """
+    Throughput report of a parse_many call.
+    """
+
+    def __init__(self):
+
+        self.documents = 0
+        self.characters = 0
+        self.quantities = 0
+        self.seconds = 0.0
+        self.workers = 0
+        self.backend = None
+        # Documents that could not be parsed because they crashed a worker
+        self.failed = 0
+        # Restarts of a broken process pool
+        self.restarts = 0
+        # Documents whose parse was cut short by the per-document timeout
+        self.timeouts = 0
+
+    @property
+    def throughput(self):
+        """
+        Documents parsed per second
+        """
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    @property
+    def char_throughput(self):
+        """
+        Characters parsed per second
+        """
+        return self.characters / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+
+        msg = "BatchStats(documents=%d, quantities=%d, seconds=%.3f, docs/s=%.1f, backend=%s, workers=%d)"
+        msg = msg % (
+            self.documents,
+            self.quantities,
+            self.seconds,
+            self.throughput,
+            self.backend,
+            self.workers,
+        )
+        return msg
+
+
+###############################################################################
+def compact(quantity):
+    """
+    Convert a Quantity to a CompactQuantity.
+    """
+    return CompactQuantity(
+        value=quantity.value,
+        unit=quantity.unit.name,
+        entity=quantity.unit.entity.name,
+        dimensions=tuple(
+            (i["base"], i["power"], i.get("surface")) for i in quantity.unit.dimensions
+        ),
+        surface=quantity.surface,
+        span=quantity.span,
+        uncertainty=quantity.uncertainty,
+    )
+
+
+def _dimensions(record):
+    """
+    Dimensions of a CompactQuantity as in Unit.dimensions.
+    """
+    dimensions = []
+    for dimension in record.dimensions:
+        # Records stored before the surfaces were kept have no third item
+        dimension = dict(zip(("base", "power", "surface"), dimension))
+        if dimension.get("surface") is None:
+            dimension.pop("surface", None)
+        dimensions.append(dimension)
+    return dimensions
+
+
+def expand(record, lang=const.LANG):
+    """
+    Convert a CompactQuantity back to a Quantity.
+    """
+    unit = load.units(lang).names.get(record.unit)
+    if unit is None:
+        unit = parser.get_unit_from_dimensions(_dimensions(record), None, lang)
+    else:
+        # Work on a copy, the loaded unit is shared between all parses
+        unit = copy.copy(unit)
+    return cls.Quantity(
+        value=record.value,
+        unit=unit,
+        surface=record.surface,
+        span=record.span,
+        uncertainty=record.uncertainty,
+        lang=lang,
+    )
+
+
+def si_conversion(record, lang, conversions):
+    """
+    SI label and factor of the unit of a CompactQuantity, or None.
+    :param conversions: dictionary caching the conversions by unit name
+    """
+    if record.unit not in conversions:
+        unit = load.units(lang).names.get(record.unit)
+        if unit is not None and unit.conversion:
+            conversion = unit.conversion
+        else:
+            conversion = parser.get_conversion_from_dimensions(_dimensions(record), lang)
+        if isinstance(conversion, dict) and "silabel" in conversion:
+            conversions[record.unit] = (conversion["silabel"], conversion["factor"])
+        else:
+            conversions[record.unit] = None
+    return conversions[record.unit]
+
+
+def quantity_record(record, lang=const.LANG, normalize_si=False, conversions=None):
+    """
+    JSON serializable dictionary of a CompactQuantity.
+    """
+    result = {
+        "value": record.value,
+        "unit": record.unit,
+        "entity": record.entity,
+        "surface": record.surface,
+        "span": list(record.span),
+        "uncertainty": record.uncertainty,
+    }
+    if normalize_si:
+        conversion = si_conversion(
+            record, lang, conversions if conversions is not None else {}
+        )
+        if conversion is not None:
+            result["si_unit"], factor = conversion
+            result["si_value"] = record.value * factor
+            if record.uncertainty is not None:
+                result["si_uncertainty"] = record.uncertainty * factor
+    return result
+
+
+###############################################################################
+def warmup(lang=const.LANG, has_value=True):
+    """
+    Load units, entities and compile the patterns of a language once, so that
+    workers share them instead of building them concurrently.
+    """
+    load.entities(lang)
+    load.units(lang)
+    load.si_units()
+    load.si_entities(lang)
+    reg.text_pattern_reg(lang)
+    reg.units_regex(lang, has_value)
+    # Parsing a short text imports the language modules
+    parser.parse("1 m", lang, has_value)
+
+
+def prefork_warmup(langs=None):
+    """
+    Warm up the given languages and move all objects created so far to the
+    permanent generation of the garbage collector, so that the collector of
+    forked workers does not touch them and their pages stay shared.
+    Call right before forking, for best results gc.disable() early in the
+    parent and gc.enable() in the children.
+    :param langs: languages to load, defaults to const.LANG
+    """
+    for lang in langs or [const.LANG]:
+        warmup(lang, True)
+        warmup(lang, False)
+    gc.collect()
+    gc.freeze()
+
+
+def _init_worker(langs, has_value):
+    """
+    Process pool initializer, warms each worker once.
+    """
+    for lang in langs:
+        warmup(lang, has_value)
+    # Metrics counted by the parent before forking
+    metrics.REGISTRY.drain()
+
+
+def _parse_one(text, lang, has_value, timeout=None, cache=None, slow_log=None):
+    """
+    Parse a document, giving up after timeout seconds.
+    """
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    parse = parser.parse if slow_log is None else slow_log.parse
+    result = parse(text, lang, has_value, deadline, cache)
+    result.seconds = time.monotonic() - start
+    return result
+
+
+def _compact_result(result):
+    return cls.ParseResult(
+        [compact(quantity) for quantity in result], result.truncated, result.seconds
+    )
+
+
+def _parse_chunk(texts, langs, has_value, timeout=None, profile=False, slow_log=None):
+    """
+    Parse a chunk of documents in a worker process.
+    :return: (results, profiling.Profile of the chunk if profile else None,
+             metrics counted by the worker meanwhile)
+    """
+    chunk_profile = profiling.Profile() if profile else contextlib.nullcontext()
+    with chunk_profile:
+        results = [
+            _compact_result(_parse_one(text, lang, has_value, timeout, None, slow_log))
+            for text, lang in zip(texts, langs)
+        ]
+    return results, chunk_profile if profile else None, metrics.REGISTRY.drain()
+
+
+###############################################################################
+def _languages(texts, lang):
+    """
+    Expand lang to one language per document.
+    """
+    if isinstance(lang, str):
+        return [lang] * len(texts)
+    langs = list(lang)
+    if len(langs) != len(texts):
+        raise ValueError(
+            "Got {} languages for {} documents".format(len(langs), len(texts))
+        )
+    return langs
+
+
+def _chunks(count, chunk_size):
+    """
+    Split range(count) into (start, end) chunks.
+    """
+    return [(i, min(i + chunk_size, count)) for i in range(0, count, chunk_size)]
+
+
+class ProcessPool(object):
+    """
+    Worker processes kept for several parse_many calls, so that they are
+    started and warmed once. A pool broken by a crashing worker is replaced
+    on its next use.
+
+        >>> with batch.ProcessPool(workers=4) as pool:
+        ...     for texts in batches:
+        ...         batch.parse_many(texts, backend="process", pool=pool)
+    """
+
+    def __init__(self, workers=None, langs=None, has_value=True):
+        """
+        :param workers: number of workers, defaults to the number of CPUs
+        :param langs: languages the workers are warmed for
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.langs = sorted(set(langs or [const.LANG]))
+        self.has_value = has_value
+        self._executor = None
+
+    def __repr__(self):
+
+        msg = "ProcessPool(workers=%d, langs=%s, started=%s)"
+        msg = msg % (self.workers, self.langs, self._executor is not None)
+        return msg
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def executor(self):
+        """
+        The running executor, started if there is none.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.langs, self.has_value),
+            )
+        return self._executor
+
+    def restart(self):
+        """
+        Drop a broken executor, the next use starts a new one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self):
+        """
+        Stop the workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _run_pool(
+    texts, langs, has_value, timeout, workers, chunks, results, profile=None,
+    slow_log=None, pool=None,
+):
+    """
+    Parse the given chunks in a fresh process pool.
+    :param profile: optional profiling.Profile, merged with the profiles of
+                    the chunks
+    :param slow_log: optional slowlog.SlowLog, written by the workers
+    :param pool: optional ProcessPool used instead of a fresh pool
+    :return: the chunks that were not finished because the pool broke
+    """
+    unfinished = list(chunks)
+    if pool is None:
+        context = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(sorted(set(langs)), has_value),
+        )
+    else:
+        context = contextlib.nullcontext(pool.executor())
+    try:
+        with context as executor:
+            futures = {
+                executor.submit(
+                    _parse_chunk,
+                    texts[start:end],
+                    langs[start:end],
+                    has_value,
+                    timeout,
+                    profile is not None,
+                    slow_log,
+                ): (start, end)
+                for start, end in chunks
+            }
+            for future in as_completed(futures):
+                start, end = futures[future]
+                results[start:end], chunk_profile, chunk_metrics = future.result()
+                metrics.REGISTRY.merge(chunk_metrics)
+                if profile is not None:
+                    profile.merge(chunk_profile)
+                unfinished.remove((start, end))
+    except BrokenProcessPool:
+        if pool is not None:
+            pool.restart()
+        return unfinished
+    return []
+
+
+def _parse_processes(
+    texts, langs, has_value, timeout, workers, chunk_size, max_retries, stats,
+    profile=None, slow_log=None, pool=None,
+):
+    """
+    Parse documents in a process pool, restarting the pool if a worker
+    crashes. Chunks that were unfinished in more than max_retries crashes are
+    parsed one at a time in a single worker and bisected on further crashes,
+    until the offending documents are isolated. These get an empty result.
+    """
+    results = [None] * len(texts)
+    pending = _chunks(len(texts), chunk_size)
+    crashes = {}
+    suspects = []
+    while pending:
+        pending = _run_pool(
+            texts, langs, has_value, timeout, workers, pending, results, profile,
+            slow_log, pool,
+        )
+        if pending and stats is not None:
+            stats.restarts += 1
+        for chunk in list(pending):
+            crashes[chunk] = crashes.get(chunk, 0) + 1
+            if crashes[chunk] > max_retries:
+                pending.remove(chunk)
+                suspects.append(chunk)
+
+    while suspects:
+        start, end = suspects.pop()
+        if not _run_pool(
+            texts, langs, has_value, timeout, 1, [(start, end)], results, profile,
+            slow_log,
+        ):
+            continue
+        if stats is not None:
+            stats.restarts += 1
+        if end - start > 1:
+            middle = (start + end) // 2
+            suspects += [(middle, end), (start, middle)]
+        else:
+            results[start] = cls.ParseResult()
+            if stats is not None:
+                stats.failed += 1
+    return results
+
+
+def parse_many(
+    texts,
+    lang=const.LANG,
+    has_value=True,
+    workers=None,
+    backend="thread",
+    stats=None,
+    chunk_size=None,
+    compact_results=False,
+    max_retries=1,
+    timeout=None,
+    cache=None,
+    profile=None,
+    slow_log=None,
+    pool=None,
+):
+    """
+    Extract all quantities from each of the given texts.
+    :param texts: iterable of texts
+    :param lang: language of all texts, or a sequence with one language per text
+    :param has_value: same as in parser.parse
+    :param workers: number of workers, defaults to the number of CPUs
+    :param backend: one of BACKENDS
+    :param stats: optional BatchStats, filled with a throughput report
+    :param chunk_size: documents sent to a worker process at once, by default
+                       every worker gets about four chunks
+    :param compact_results: return CompactQuantity records instead of Quantity
+                            objects, avoids rebuilding the objects from the
+                            process backend
+    :param max_retries: how often a chunk is retried after crashing a worker
+                        before it is split up
+    :param timeout: time budget per document in seconds, documents taking
+                    longer get the quantities found so far and are flagged
+                    as truncated
+    :param cache: optional cache.ResultCache shared by the serial and thread
+                  backends, worker processes cannot share it
+    :param profile: optional profiling.Profile receiving the time spent in
+                    each parse stage over the whole batch; with the serial
+                    and thread backends it also receives concurrent parses
+                    of other threads
+    :param slow_log: optional slowlog.SlowLog capturing the slow documents
+                     with their stage timings
+    :param pool: optional ProcessPool of the process backend, reused instead
+                 of starting workers for this call; its size overrides workers
+    :return: list with the quantities of each text, in input order
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            "Unknown backend {}, expected one of {}".format(backend, BACKENDS)
+        )
+    if cache is not None and backend == "process":
+        raise ValueError("The process backend cannot share an in-process cache")
+    if pool is not None and backend != "process":
+        raise ValueError("A process pool needs the process backend")
+    texts = list(texts)
+    langs = _languages(texts, lang)
+    workers = pool.workers if pool is not None else workers or os.cpu_count() or 1
+
+    for language in set(langs):
+        warmup(language, has_value)
+
+    start = time.perf_counter()
+    if backend == "process":
+        chunk_size = chunk_size or max(1, -(-len(texts) // (workers * 4)))
+        results = _parse_processes(
+            texts, langs, has_value, timeout, workers, chunk_size, max_retries, stats,
+            profile, slow_log, pool,
+        )
+        if not compact_results:
+            results = [
+                cls.ParseResult(
+                    [expand(record, language) for record in result],
+                    result.truncated,
+                    result.seconds,
+                )
+                for result, language in zip(results, langs)
+            ]
+    else:
+        with profile if profile is not None else contextlib.nullcontext():
+            if backend == "serial" or workers == 1:
+                results = [
+                    _parse_one(text, language, has_value, timeout, cache, slow_log)
+                    for text, language in zip(texts, langs)
+                ]
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(
+                        executor.map(
+                            _parse_one,
+                            texts,
+                            langs,
+                            [has_value] * len(texts),
+                            [timeout] * len(texts),
+                            [cache] * len(texts),
+                            [slow_log] * len(texts),
+                        )
+                    )
+        if compact_results:
+            results = [_compact_result(result) for result in results]
+
+    for result, language in zip(results, langs):
+        metrics.record_document(result, language)
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
+        stats.documents += len(texts)
+        stats.characters += sum(len(text) for text in texts)
+        stats.quantities += sum(len(result) for result in results)
+        stats.timeouts += sum(result.truncated for result in results)
+        stats.workers = workers
+        stats.backend = backend
+    return results
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` in-process cache of parse results.
+"""
+
+import copy
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+from . import chunking
+from . import classes as cls
+from . import const, load, metrics, parser
+
+# Default number of cached sentences
+MAX_SIZE = 10000
+
+
+###############################################################################
+def key(text, lang=const.LANG, has_value=True):
+    """
+    Hash of a text together with everything its quantities depend on.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(lang.encode("utf-8") + b"\0")
+    digest.update(b"1" if has_value else b"0")
+    digest.update(load.data_version(lang).encode("ascii"))
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+def _copy(quantity):
+    """
+    Copy of a quantity and its unit, entities are shared as in a parse.
+    """
+    quantity = copy.copy(quantity)
+    quantity.unit = copy.copy(quantity.unit)
+    quantity.unit.dimensions = [dict(i) for i in quantity.unit.dimensions]
+    return quantity
+
+
+###############################################################################
+class ResultCache(object):
+    """
+    Size-bounded LRU cache of the quantities of sentences, safe to share
+    between threads.
+    """
+
+    def __init__(self, maxsize=MAX_SIZE):
+        """
+        :param maxsize: maximal number of cached sentences
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize has to be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Data versions by language, those of registries are dropped together
+        # with the registry
+        self._versions = {}
+        self._registry_versions = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+
+        msg = "ResultCache(size=%d, maxsize=%d, hits=%d, misses=%d, evictions=%d)"
+        msg = msg % (
+            len(self),
+            self.maxsize,
+            self.hits,
+            self.misses,
+            self.evictions,
+        )
+        return msg
+
+    def stats(self):
+        """
+        Hit, miss and eviction counts.
+        """
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, text, lang=const.LANG, has_value=True):
+        """
+        Cached quantities of a text, or None.
+        :return: copies of the quantities, spans relative to text
+        """
+        entry_key = self._key(text, lang, has_value)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                self.misses += 1
+                metrics.CACHE_LOOKUPS.inc(1, ("memory", "miss"))
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+        metrics.CACHE_LOOKUPS.inc(1, ("memory", "hit"))
+        return [_copy(quantity) for quantity in entry]
+
+    def put(self, text, quantities, lang=const.LANG, has_value=True):
+        """
+        Store copies of the quantities of a text, evicting the least recently
+        used entries beyond maxsize.
+        """
+        entry_key = self._key(text, lang, has_value)
+        entry = tuple(_copy(quantity) for quantity in quantities)
+        with self._lock:
+            self._entries[entry_key] = entry
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def parse(self, text, lang=const.LANG, has_value=True, deadline=None):
+        """
+        Extract all quantities from unstructured text, parsing only the
+        sentences that are not cached yet. Quantities never span sentences,
+        see chunking.sentences.
+        :param deadline: see parser.parse, truncated sentences are not cached
+        """
+        result = cls.ParseResult()
+        for start, end in chunking.sentences(text):
+            # Trailing whitespace neither changes quantities nor their spans
+            sentence = text[start:end].rstrip()
+            quantities = self.get(sentence, lang, has_value)
+            if quantities is None:
+                quantities = parser.parse(sentence, lang, has_value, deadline)
+                if quantities.truncated:
+                    result.truncated = True
+                else:
+                    self.put(sentence, quantities, lang, has_value)
+            result.extend(parser._shift(quantity, start) for quantity in quantities)
+            if result.truncated:
+                break
+        return result
+
+    def _key(self, text, lang, has_value):
+        """
+        Key of a text, dropping all entries once the data of lang changed.
+        Registries have data versions of their own, tracked separately.
+        """
+        version = load.data_version(lang)
+        registry = load.REGISTRY.get()
+        with self._lock:
+            if registry is None:
+                versions = self._versions
+            else:
+                versions = self._registry_versions.setdefault(registry, {})
+            if versions.get(lang, version) != version:
+                self._entries.clear()
+                self._versions.clear()
+                for others in self._registry_versions.values():
+                    others.clear()
+            versions[lang] = version
+        return key(text, lang, has_value)
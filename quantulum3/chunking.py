@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` functions for splitting large texts into windows.
+"""
+
+import re
+
+# Characters per window and minimal context around its core
+WINDOW_SIZE = 1 << 16
+OVERLAP = 256
+
+_SENTENCE_END = re.compile(r"[.!?;]\s+|\n\s*")
+_SPACE = re.compile(r"\s+")
+_SENTENCE_END_BYTES = re.compile(rb"[.!?;]\s+|\n\s*")
+_SPACE_BYTES = re.compile(rb"\s+")
+
+
+###############################################################################
+def _patterns(data):
+    if isinstance(data, str):
+        return _SENTENCE_END, _SPACE
+    return _SENTENCE_END_BYTES, _SPACE_BYTES
+
+
+def char_start(data, position):
+    """
+    Start of the character at position, so that windows of UTF-8 bytes
+    without whitespace are not cut within a character. Bytes of single byte
+    encodings move back by at most three bytes, which keeps them decodable.
+    """
+    if isinstance(data, str):
+        return position
+    for _ in range(3):
+        if position <= 0 or position >= len(data) or data[position] & 0xC0 != 0x80:
+            break
+        position -= 1
+    return position
+
+
+def boundary_before(data, position, search):
+    """
+    Last sentence boundary, or else whitespace boundary, in the search
+    characters before position. Boundaries are the start of the following
+    sentence or word.
+    :param data: str or bytes-like, bytes must be ASCII compatible
+    :return: the boundary, else the start of the character at position
+    """
+    if position <= 0:
+        return 0
+    if position >= len(data):
+        return len(data)
+    start = max(0, position - search)
+    chunk = data[start:position]
+    for pattern in _patterns(data):
+        last = None
+        for last in pattern.finditer(chunk):
+            pass
+        if last is not None:
+            return start + last.end()
+    return char_start(data, position)
+
+
+def boundary_after(data, position, search):
+    """
+    First sentence boundary, or else whitespace boundary, in the search
+    characters after position.
+    :return: the boundary, else the start of the character at position
+    """
+    if position <= 0:
+        return 0
+    if position >= len(data):
+        return len(data)
+    chunk = data[position:position + search]
+    for pattern in _patterns(data):
+        match = pattern.search(chunk)
+        if match:
+            return position + match.end()
+    return char_start(data, position)
+
+
+###############################################################################
+def windows(data, size=WINDOW_SIZE, overlap=OVERLAP):
+    """
+    Split data into consecutive cores ending at sentence or whitespace
+    boundaries, each surrounded by at least overlap characters of context.
+    A quantity belongs to the window its start falls into, so that no quantity
+    is cut in half or reported twice as long as it is shorter than overlap.
+    :param data: str or bytes-like, bytes must be ASCII compatible
+    :return: generator of (start, core_start, core_end, end), the window is
+             data[start:end]
+    """
+    length = len(data)
+    core_start = 0
+    while core_start < length:
+        core_end = length
+        if core_start + size < length:
+            core_end = boundary_before(data, core_start + size, size // 2)
+        start = boundary_before(data, core_start - overlap, overlap)
+        end = boundary_after(data, core_end + overlap, overlap)
+        yield start, core_start, core_end, end
+        core_start = core_end
+
+
+def file_windows(data, size=WINDOW_SIZE, overlap=OVERLAP, encoding="utf-8"):
+    """
+    Decode the windows of ASCII compatible encoded data.
+    :return: generator of (text, offset, core_start, core_end) with character
+             offsets, text starts at character offset
+    """
+    chars = 0
+    for start, core_start, core_end, end in windows(data, size, overlap):
+        before = data[start:core_start].decode(encoding)
+        core = data[core_start:core_end].decode(encoding)
+        after = data[core_end:end].decode(encoding)
+        yield before + core + after, chars - len(before), chars, chars + len(core)
+        chars += len(core)
+
+
+def sentences(text):
+    """
+    Split text after each sentence end, the pieces add up to the text.
+    :return: generator of (start, end) offsets
+    """
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() < len(text):
+            yield start, match.end()
+            start = match.end()
+    if start < len(text):
+        yield start, len(text)
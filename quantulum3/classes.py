@@ -165,3 +165,59 @@ class Quantity(object):
         :return: Speakable version of this quantity
         """
         return speak.quantity_to_spoken(self, lang or self.lang)
+
+
+###############################################################################
+class UnitMention(object):
+    """
+    Class for a unit mentioned without a value (e.g. "km/h").
+    """
+
+    def __init__(
+            self,
+            unit: Unit,
+            surface: str,
+            span: Tuple[int, int],
+            lang="vi",
+    ):
+
+        self.unit = unit
+        self.surface = surface
+        self.span = span
+        self.lang = lang
+
+    def __repr__(self):
+
+        msg = 'UnitMention("%s", "%s")'
+        msg = msg % (self.surface, repr(self.unit))
+        return msg
+
+    def __eq__(self, other):
+
+        if isinstance(other, self.__class__):
+            return (
+                    self.unit == other.unit
+                    and self.surface == other.surface
+                    and self.span == other.span
+            )
+        else:
+            return False
+
+    def __ne__(self, other):
+
+        return not self.__eq__(other)
+
+
+###############################################################################
+class ParseResult(list):
+    """
+    List of the quantities extracted from a text.
+    """
+
+    def __init__(self, quantities=(), truncated=False, seconds=None):
+
+        super().__init__(quantities)
+        # Whether parsing stopped early because its deadline passed
+        self.truncated = truncated
+        # Parse time of the text, set by batch parsing
+        self.seconds = seconds
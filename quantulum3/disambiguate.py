@@ -12,11 +12,12 @@ def disambiguate_unit(unit_surface, lang=const.LANG):
     returns (str) unit name of the resolved unit
     """
     try:
+        # Lookups must not add keys, the indexes are shared and patched in place
         base = (
-                load.units(lang).symbols[unit_surface]
-                or load.units(lang).surfaces[unit_surface]
-                or load.units(lang).surfaces_lower[unit_surface.lower()]
-                or load.units(lang).symbols_lower[unit_surface.lower()]
+                load.units(lang).symbols.get(unit_surface)
+                or load.units(lang).surfaces.get(unit_surface)
+                or load.units(lang).surfaces_lower.get(unit_surface.lower())
+                or load.units(lang).symbols_lower.get(unit_surface.lower(), set())
         )
         if len(base) > 1:
             # base = no_clf.disambiguate_no_classifier(base, text, lang)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` incremental parsing of edited texts.
+"""
+
+import bisect
+from typing import List
+
+from . import chunking, const, parser
+from . import classes as cls
+
+
+###############################################################################
+class IncrementalParser(object):
+    """
+    Keep the quantities of a text up to date while it is edited, reparsing
+    only the region around each edit.
+    """
+
+    def __init__(
+        self, text="", lang=const.LANG, has_value=True, context=chunking.OVERLAP
+    ):
+        """
+        :param context: characters around an edit that are reparsed, has to be
+                        longer than any quantity
+        """
+        self.lang = lang
+        self.has_value = has_value
+        self.context = context
+        self.reset(text)
+
+    @property
+    def quantities(self) -> List[cls.Quantity]:
+        """
+        Quantities of the current text, ordered by their start. Their spans are
+        updated in place by later edits.
+        """
+        return list(self._quantities)
+
+    def reset(self, text):
+        """
+        Replace the whole text and parse it from scratch.
+        """
+        self.text = text
+        self._quantities = sorted(
+            parser.parse(text, self.lang, self.has_value), key=lambda q: q.span[0]
+        )
+        self._starts = [quantity.span[0] for quantity in self._quantities]
+        return self.quantities
+
+    def edit(self, offset, removed, inserted) -> List[cls.Quantity]:
+        """
+        Replace removed characters at offset with the inserted text.
+        :return: the quantities of the edited text
+        """
+        if not 0 <= offset <= offset + removed <= len(self.text):
+            raise ValueError(
+                "Edit ({}, {}) outside of text of length {}".format(
+                    offset, removed, len(self.text)
+                )
+            )
+        text = self.text[:offset] + inserted + self.text[offset + removed:]
+        delta = len(inserted) - removed
+        context = self.context
+
+        # Reparsed core in the new text and the context around it
+        core_start = chunking.boundary_before(text, offset - context, context)
+        core_end = chunking.boundary_after(
+            text, offset + len(inserted) + context, context
+        )
+        start = chunking.boundary_before(text, core_start - context, context)
+        end = chunking.boundary_after(text, core_end + context, context)
+
+        quantities = parser.iter_parse(text[start:end], self.lang, self.has_value)
+        new = sorted(
+            parser._window_quantities(quantities, start, core_start, core_end),
+            key=lambda q: q.span[0],
+        )
+
+        # Quantities before the core are untouched, those after it move
+        first = bisect.bisect_left(self._starts, core_start)
+        last = bisect.bisect_left(self._starts, core_end - delta)
+        following = self._quantities[last:]
+        for quantity in following:
+            parser._shift(quantity, delta)
+
+        self._quantities[first:] = new + following
+        self._starts[first:] = [q.span[0] for q in new] + [
+            start + delta for start in self._starts[last:]
+        ]
+        self.text = text
+        return self.quantities
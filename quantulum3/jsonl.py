@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` reading documents from and writing quantities to JSON lines.
+"""
+
+import gzip
+import io
+import json
+import sys
+
+from . import batch, const
+
+# Documents read and parsed at once
+BATCH_SIZE = 10000
+
+
+###############################################################################
+def open_file(path, mode="r"):
+    """
+    Open a text file, stdin or stdout for "-", gzip compressed for ".gz".
+    """
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        return io.TextIOWrapper(
+            stream.buffer, encoding="utf-8", errors="replace", newline="\n"
+        )
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", errors="replace")
+    return open(path, mode, encoding="utf-8", errors="replace")
+
+
+def read_documents(paths, jsonl=False, field="text"):
+    """
+    Read documents line by line.
+    :return: generator of (record, text), record is the JSON record or None,
+             text is None for lines that are no valid record
+    """
+    for path in paths:
+        with open_file(path) as file:
+            for line in file:
+                line = line.rstrip("\n")
+                if not jsonl:
+                    yield None, line
+                    continue
+                try:
+                    record = json.loads(line)
+                    text = record[field]
+                    if not isinstance(text, str):
+                        raise TypeError("%s is no string" % field)
+                except (ValueError, KeyError, TypeError) as err:
+                    yield {"error": "%s: %s" % (type(err).__name__, err)}, None
+                else:
+                    yield record, text
+
+
+def read_batches(documents, size):
+    """
+    Group documents into lists of at most size documents.
+    """
+    current = []
+    for document in documents:
+        current.append(document)
+        if len(current) >= size:
+            yield current
+            current = []
+    if current:
+        yield current
+
+
+def extract(
+    documents,
+    output,
+    lang=const.LANG,
+    has_value=True,
+    field="text",
+    normalize_si=False,
+    batch_size=BATCH_SIZE,
+    stats=None,
+    latencies=None,
+    callback=None,
+    **kwargs
+):
+    """
+    Parse documents in batches and write one JSON line per document, in
+    input order. Memory use is bounded by batch_size.
+    :param documents: (record, text) pairs of read_documents
+    :param output: text file the JSON lines are written to
+    :param stats: optional batch.BatchStats, filled over all batches
+    :param latencies: optional metrics.LatencyHistogram of parse times
+    :param callback: optional function called after each batch
+    :param kwargs: options of batch.parse_many
+    :return: number of invalid records
+    """
+    if kwargs.get("backend") == "process" and kwargs.get("pool") is None:
+        # One set of workers for all batches
+        langs = [lang] if isinstance(lang, str) else lang
+        with batch.ProcessPool(kwargs.pop("workers", None), langs, has_value) as pool:
+            return extract(
+                documents, output, lang, has_value, field, normalize_si, batch_size,
+                stats, latencies, callback, pool=pool, **kwargs
+            )
+    stats = stats if stats is not None else batch.BatchStats()
+    conversions = {}
+    errors = 0
+    for documents in read_batches(documents, batch_size):
+        texts = [text for _, text in documents if text is not None]
+        results = iter(
+            batch.parse_many(
+                texts, lang, has_value, stats=stats, compact_results=True, **kwargs
+            )
+        )
+        for record, text in documents:
+            if text is None:
+                errors += 1
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                continue
+            result = next(results)
+            if latencies is not None and result.seconds is not None:
+                latencies.add(result.seconds)
+            record = dict(record or {})
+            record.pop(field, None)
+            record["quantities"] = [
+                batch.quantity_record(quantity, lang, normalize_si, conversions)
+                for quantity in result
+            ]
+            if result.truncated:
+                record["truncated"] = True
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if callback is not None:
+            callback()
+    return errors
+
+
+def summary(stats, latencies, errors, seconds):
+    """
+    One line throughput and latency report of extract.
+    """
+    msg = "%d documents, %d quantities, %d invalid, %d timeouts, %d failed in %.2f s"
+    msg += " (%.1f docs/s, %.0f chars/s), latency p50 %.2f ms, p99 %.2f ms, max %.2f ms"
+    return msg % (
+        stats.documents,
+        stats.quantities,
+        errors,
+        stats.timeouts,
+        stats.failed,
+        seconds,
+        stats.documents / seconds if seconds else 0.0,
+        stats.characters / seconds if seconds else 0.0,
+        latencies.percentile(0.5) * 1000,
+        latencies.percentile(0.99) * 1000,
+        latencies.max * 1000,
+    )
@@ -9,8 +9,6 @@ import os
 from builtins import open
 from collections import defaultdict
 
-import inflect
-
 from ... import load, const
 from . import lang
 
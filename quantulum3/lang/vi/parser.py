@@ -4,6 +4,7 @@
 :mod:`Quantulum` parser.
 """
 
+import copy
 import re
 
 from ... import classes as cls
@@ -20,8 +21,9 @@ def clean_surface(surface, span):
     """
 
     surface = surface.replace("-", " ")
+    misc_num = reg.misc_num(lang)
     no_start = ["and", " "]
-    no_end = [" "] + [" {}".format(misc) for misc in reg.misc_num(lang)]
+    no_end = [" "] + [" {}".format(misc) for misc in misc_num]
 
     found = True
     while found:
@@ -42,7 +44,7 @@ def clean_surface(surface, span):
 
     split = surface.lower().split()
     if (
-        split[0] in reg.misc_num(lang)
+        split[0] in misc_num
         and len(split) > 1
         and split[1] in reg.units(lang) + reg.tens(lang)
     ):
@@ -58,6 +60,9 @@ def extract_spell_out_values(text, has_value):
     Convert spelled out numbers in a given text to digits.
     """
     values = []
+    grouping_regex = r"(-$|[%s])" % reg.grouping_operators_regex(lang)
+    numwords = reg.number_words(lang)
+    numwords_regex = reg.numberwords_regex(lang)
     for item in reg.text_pattern_reg(lang).finditer(text):
         try:
             surface, span = clean_surface(item.group(0), item.span())
@@ -70,19 +75,10 @@ def extract_spell_out_values(text, has_value):
             result = 0.0
             for word in surface.lower().split():
                 try:
-                    scale, increment = (
-                        1,
-                        float(
-                            re.sub(
-                                r"(-$|[%s])" % reg.grouping_operators_regex(lang),
-                                "",
-                                word,
-                            )
-                        ),
-                    )
+                    scale, increment = 1, float(re.sub(grouping_regex, "", word))
                 except ValueError:
-                    match = re.search(reg.numberwords_regex(), word)
-                    scale, increment = reg.number_words(lang)[match.group(0)]
+                    match = re.search(numwords_regex, word)
+                    scale, increment = numwords[match.group(0)]
                 curr = curr * scale + increment
                 if scale > 100 or word == "and":
                     result += curr
@@ -131,21 +127,28 @@ def parse_unit(_, unit, slash):
 
 
 ###############################################################################
-def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
+def build_quantity(
+    orig_text, text, item, values, unit, surface, span, uncert, stages=parser.STAGES,
+    quotes=None,
+):
     """
     Build a Quantity object out of extracted information.
+    :param stages: enabled optional stages, see parser.STAGES
+    :param quotes: parser.find_quotes(text) if already known
     """
     # TODO rerun if change occurred
     # Re parse unit if a change occurred
     dimension_change = True
+    heuristics = "heuristics" in stages
 
     # Extract "absolute " ...
     _absolute = "absolute "
     if (
-        unit.name == "dimensionless"
+        heuristics
+        and unit.name == "dimensionless"
         and _absolute == orig_text[span[0] - len(_absolute) : span[0]]
     ):
-        unit = load.units(lang).names["kelvin"]
+        unit = copy.copy(load.units(lang).names["kelvin"])
         unit.original_dimensions = unit.dimensions
         surface = _absolute + surface
         span = (span[0] - len(_absolute), span[1])
@@ -183,7 +186,7 @@ def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
                 dimension_change = True
 
     # Usually "1990s" stands for the decade, not the amount of seconds
-    elif re.match(r"[1-2]\d\d0s", surface):
+    elif heuristics and re.match(r"[1-2]\d\d0s", surface):
         unit.original_dimensions = []
         dimension_change = True
         surface = surface[:-1]
@@ -191,7 +194,8 @@ def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
 
     # Usually "1am", "5.12 pm" stand for the time, not pico- or attometer
     if (
-        len(unit.dimensions) == 1
+        heuristics
+        and len(unit.dimensions) == 1
         and ("pm" == item.group("unit1") or "am" == item.group("unit1"))
         and unit.entity.name == "length"
         and re.fullmatch(r"\d(\.\d\d)?", item.group("value"))
@@ -210,12 +214,12 @@ def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
         ):
             span = (span[0] - 1, span[1] + 1)
             surface = "({})".format(surface)
-            values[0] = -values[0]
+            values = [-values[0]]
     except IndexError:
         pass
 
     # check if a unit without operators, actually is a common word
-    pruned_common_word = unit.original_dimensions
+    pruned_common_word = "common_words" in stages and unit.original_dimensions
     while pruned_common_word:
         pruned_common_word = False
 
@@ -289,7 +293,7 @@ def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
                 pruned_common_word = True
                 continue
 
-    match = parser.is_quote_artifact(text, item.span())
+    match = "quote_check" in stages and parser.is_quote_artifact(text, item.span(), quotes)
     if match:
         surface = surface[:-1]
         span = (span[0], span[1] - 1)
@@ -322,7 +326,7 @@ def build_quantity(orig_text, text, item, values, unit, surface, span, uncert):
     if (
         surface.lower() in ["a", "an", "one"]
         or re.search(r"1st|2nd|3rd|[04-9]th", surface)
-        or re.search(r"\d+[A-Z]+\d+", surface)
+        or re.search(r"\d[A-Z]+\d", surface)
         or re.search(r"\ba second\b", surface, re.IGNORECASE)
     ):
         return
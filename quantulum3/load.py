@@ -4,8 +4,12 @@
 :mod:`Quantulum` unit and entity loading functions.
 """
 import quantulum3 as q
+import contextvars
+import functools
+import hashlib
 import json
-from collections import defaultdict
+import threading
+from collections import ChainMap, defaultdict
 from pathlib import Path
 from typing import Any, List, Tuple, Union
 
@@ -19,24 +23,73 @@ _CACHE_DICT = {}
 def cached(funct):
     """
     Decorator for caching language specific data
-    :param funct: the method, dynamically responding to language. Only
-                  parameter is lang
+    :param funct: the method, dynamically responding to language. First
+                  parameter is lang, further positional parameters are
+                  part of the cache key
     :return: the method, dynamically responding to language but also caching
              results
     """
     assert callable(funct)
 
-    def cached_function(lang=const.LANG):
+    @functools.wraps(funct)
+    def cached_function(lang=const.LANG, *args):
+        key = (lang,) + args
         try:
-            return _CACHE_DICT[id(funct)][lang]
+            return _CACHE_DICT[id(funct)][key]
         except KeyError:
-            result = funct(lang)
-            _CACHE_DICT[id(funct)] = {lang: result}
+            result = funct(lang, *args)
+            _CACHE_DICT.setdefault(id(funct), {})[key] = result
             return result
 
     return cached_function
 
 
+# Registry of the current parse, see registry.Registry
+REGISTRY = contextvars.ContextVar("quantulum3_registry", default=None)
+# Moves on with every change of the custom units and entities, dropping the
+# data cached by registries
+_EPOCH = 0
+
+
+def scoped(layer):
+    """
+    Decorator for caching data depending on the custom units and entities.
+    Without an active registry it caches like cached. Within one, results are
+    cached by the registry and built by layer(registry, base, lang, *args)
+    from the result of the process, base.
+    :param layer: function layering the registry over base
+    """
+
+    def decorator(funct):
+        cached_function = cached(funct)
+
+        @functools.wraps(funct)
+        def scoped_function(lang=const.LANG, *args):
+            registry = REGISTRY.get()
+            if registry is None:
+                return cached_function(lang, *args)
+            if registry.epoch != _EPOCH:
+                registry.cache, registry.epoch = {}, _EPOCH
+            cache = registry.cache
+            key = (id(funct), lang) + args
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            # The shared data must not be built from registry data
+            token = REGISTRY.set(None)
+            try:
+                base = cached_function(lang, *args)
+            finally:
+                REGISTRY.reset(token)
+            result = cache[key] = layer(registry, base, lang, *args)
+            return result
+
+        return scoped_function
+
+    return decorator
+
+
 def object_pairs_hook_defer_duplicate_keys(object_pairs: List[Tuple[str, Any]]):
     keys = [x[0] for x in object_pairs]
     try:
@@ -125,6 +178,8 @@ class Entities(object):
         Load entities from JSON file.
         """
 
+        self.sources = entity_dicts
+
         # Merge entity dictionary's
         all_entities = defaultdict(dict)
         for ed in entity_dicts:
@@ -146,15 +201,85 @@ class Entities(object):
         # Generate derived units
         derived_ent = defaultdict(set)
         for entity in self.names.values():
-            if not entity.dimensions:
-                continue
-            perms = self.get_dimension_permutations(entity.dimensions)
-            for perm in perms:
-                key = get_key_from_dimensions(perm)
+            for key in self.derived_keys(entity):
                 derived_ent[key].add(entity)
 
         self.derived = derived_ent
 
+    def derived_keys(self, entity):
+        """
+        Keys of the derived table under which entity is found.
+        """
+        if not entity.dimensions:
+            return []
+        perms = self.get_dimension_permutations(entity.dimensions)
+        return [get_key_from_dimensions(perm) for perm in perms]
+
+    def update(self, name, in_place=True):
+        """
+        Reload the entity name from the sources in place. Only the derived
+        keys of the entity and of the entities defined in terms of it are
+        recomputed.
+        :param in_place: change an existing entity object, so units see the
+                         change, rather than replacing it
+        """
+        props = None
+        for ed in self.sources:
+            new_ent = _load_json_dict(ed).get(name)
+            if new_ent is not None:
+                props = dict(props or {}, **new_ent)
+
+        affected = [
+            entity
+            for entity in self.names.values()
+            if entity.name == name
+            or any(item["base"] == name for item in entity.dimensions)
+        ]
+        # Entities hash by name and URI, take them out before changing them
+        for entity in affected:
+            for key in self.derived_keys(entity):
+                self.derived[key] = {
+                    item for item in self.derived.get(key, ()) if item is not entity
+                }
+
+        entity = self.names.get(name)
+        if props is None:
+            self.names.pop(name, None)
+            affected = [item for item in affected if item is not entity]
+        elif entity is None or not in_place:
+            new = classes.Entity(
+                name=name, dimensions=props.get("dimensions", []), uri=props.get("URI")
+            )
+            self.names[name] = new
+            affected = [item for item in affected if item is not entity] + [new]
+        else:
+            entity.dimensions = props.get("dimensions", [])
+            entity.uri = props.get("URI")
+
+        for entity in affected:
+            for key in self.derived_keys(entity):
+                self.derived[key] = self.derived.get(key, set()) | {entity}
+
+    def overlay(self, custom):
+        """
+        Entities layering the custom entities over these, sharing their
+        tables. The custom entities replace existing ones of the same name
+        rather than changing them.
+        :param custom: dict of entity name to properties as in entities.json
+        """
+        entities_ = Entities.__new__(Entities)
+        entities_.names = ChainMap({}, self.names)
+        entities_.derived = ChainMap({}, self.derived)
+        base = dict(
+            (name, {"dimensions": self.names[name].dimensions, "URI": self.names[name].uri})
+            for name in custom
+            if name in self.names
+        )
+        entities_.sources = [base, custom]
+        for name in custom:
+            entities_.update(name, in_place=False)
+        return entities_
+
     def get_dimension_permutations(self, derived):
         """
         Get all possible dimensional definitions for an entity.
@@ -183,7 +308,11 @@ class Entities(object):
         return candidates
 
 
-@cached
+def _layer_entities(registry, base, lang=const.LANG):
+    return base.overlay(registry.entities) if registry.entities else base
+
+
+@scoped(_layer_entities)
 def entities(lang=const.LANG):
     """
     Cached entity object
@@ -194,14 +323,15 @@ def entities(lang=const.LANG):
 
 
 ###############################################################################
-def get_derived_units(names):
+def get_derived_units(names, only=None):
     """
     Create dictionary of unit dimensions.
+    :param only: names of the units to include, all units by default
     """
 
     derived_uni = {}
 
-    for name in names:
+    for name in names if only is None else only:
         key = get_key_from_dimensions(names[name].dimensions)
         derived_uni[key] = names[name]
         plain_derived = [{"base": name, "power": 1}]
@@ -231,21 +361,9 @@ class Units(object):
         self.prefix_symbols = defaultdict(set)
         self.lang = lang
         self.unit_dict = None
+        self.sources = unit_dict_json
 
-        unit_dict = defaultdict(dict)
-        for ud in unit_dict_json:
-            for name, unit in _load_json_dict(ud).items():
-                for _name, _unit in self.prefixed_units(name, unit):
-                    # unit_dict[_name].update(_unit)
-                    if unit_dict.get(_name) is None:
-                        unit_dict[_name] = _unit
-                    else:
-                        surfaces = unit_dict[_name].get('surfaces', []).extend(_unit.get('surfaces', []))
-                        if surfaces is not None:
-                            unit_dict[_name]["surfaces"] = list(set(surfaces))
-                        if _unit.get("conversion") is not None:
-                            unit_dict[_name]["conversion"] = _unit["conversion"]
-
+        unit_dict = self.merge(unit_dict_json)
         for name, unit in unit_dict.items():
             self.load_unit(name, unit)
 
@@ -261,6 +379,29 @@ class Units(object):
         self.surfaces_all = self.surfaces.copy()
         self.surfaces_all.update(self.surfaces_lower)
 
+    @classmethod
+    def merge(cls, unit_dict_json, only=None):
+        """
+        Merge the unit dictionaries, prefixed units included.
+        :param only: names of the units to keep, all units by default
+        """
+        unit_dict = defaultdict(dict)
+        for ud in unit_dict_json:
+            for name, unit in _load_json_dict(ud).items():
+                for _name, _unit in cls.prefixed_units(name, unit):
+                    if only is not None and _name not in only:
+                        continue
+                    # unit_dict[_name].update(_unit)
+                    if unit_dict.get(_name) is None:
+                        unit_dict[_name] = _unit
+                    else:
+                        surfaces = unit_dict[_name].get('surfaces', []).extend(_unit.get('surfaces', []))
+                        if surfaces is not None:
+                            unit_dict[_name]["surfaces"] = list(set(surfaces))
+                        if _unit.get("conversion") is not None:
+                            unit_dict[_name]["conversion"] = _unit["conversion"]
+        return unit_dict
+
     def load_unit(self, name, unit):
         try:
             assert name not in self.names
@@ -268,7 +409,21 @@ class Units(object):
             msg = "Two units with same name in units.json: %s" % name
             raise Exception(msg)
 
-        obj = classes.Unit(
+        obj = self.make_unit(name, unit)
+        self.names[name] = obj
+
+        for symbol in unit.get("symbols", []):
+            self.symbols[symbol].add(obj)
+            self.symbols_lower[symbol.lower()].add(obj)
+            if unit["entity"] == "currency":
+                self.prefix_symbols[symbol].add(obj)
+
+        for surface in unit.get("surfaces", []):
+            self.surfaces[surface].add(obj)
+            self.surfaces_lower[surface.lower()].add(obj)
+
+    def make_unit(self, name, unit):
+        return classes.Unit(
             name=name,
             surfaces=unit.get("surfaces", []),
             entity=entities().names[unit["entity"]],
@@ -280,17 +435,110 @@ class Units(object):
             lang=self.lang,
         )
 
-        self.names[name] = obj
+    def update(self, names):
+        """
+        Reload the units names from the sources in place. The indexes of the
+        old and new units are patched and only the derived keys they touch
+        are recomputed. Index sets are replaced rather than changed, so
+        concurrent parses see either the old or the new set.
+        :param names: names of the units to reload, prefixed units included
+        """
+        unit_dict = self.merge(self.sources, names)
+        old = [self.names[name] for name in names if name in self.names]
+        keys = {key for obj in old for key in self._derived_keys(obj.name)}
+        for obj in old:
+            self._reindex(obj, remove=True)
+
+        for name in names:
+            if name not in unit_dict:
+                self.names.pop(name, None)
+                self.unit_dict.pop(name, None)
+        for name, unit in unit_dict.items():
+            # Assigning keeps the position of replaced units in names
+            obj = self.names[name] = self.make_unit(name, unit)
+            self.unit_dict[name] = unit
+            self._reindex(obj)
+
+        keys.update(get_derived_units(self.names, list(unit_dict)))
+        # Later units win, as when building the table at once
+        winners = {}
+        for name, obj in self.names.items():
+            for key in self._derived_keys(name):
+                if key in keys:
+                    winners[key] = obj
+        for key in keys:
+            if key in winners:
+                self.derived[key] = winners[key]
+            else:
+                self.derived.pop(key, None)
 
-        for symbol in unit.get("symbols", []):
-            self.symbols[symbol].add(obj)
-            self.symbols_lower[symbol.lower()].add(obj)
-            if unit["entity"] == "currency":
-                self.prefix_symbols[symbol].add(obj)
+    def overlay(self, custom):
+        """
+        Units layering the custom units over these, sharing their tables and
+        unit objects. Only the entries touched by the custom units are held
+        by the overlay.
+        :param custom: dict of unit name to properties as in units.json
+        """
+        units_ = Units.__new__(Units)
+        units_.lang = self.lang
+        for attr in (
+            "names", "symbols", "symbols_lower", "surfaces", "surfaces_lower",
+            "prefix_symbols", "symbols_all", "surfaces_all", "unit_dict", "derived",
+        ):
+            setattr(units_, attr, ChainMap({}, getattr(self, attr)))
+        names = set(
+            _name
+            for name, unit in custom.items()
+            for _name, _ in self.prefixed_units(name, unit)
+        )
+        base = {}
+        for name in names & set(self.unit_dict):
+            # Merging extends the surfaces of the first entry, and the prefixed
+            # units are already in the base
+            base[name] = dict(
+                self.unit_dict[name], surfaces=list(self.unit_dict[name].get("surfaces", []))
+            )
+            base[name].pop("prefixes", None)
+        units_.sources = [base, custom]
+        units_.update(names)
+        return units_
+
+    def _derived_keys(self, name):
+        # As in get_derived_units, from the dimensions before defaulting them
+        return (
+            get_key_from_dimensions(self.unit_dict[name].get("dimensions", [])),
+            get_key_from_dimensions([{"base": name, "power": 1}]),
+        )
 
-        for surface in unit.get("surfaces", []):
-            self.surfaces[surface].add(obj)
-            self.surfaces_lower[surface.lower()].add(obj)
+    def _reindex(self, obj, remove=False):
+        """
+        Add obj to or remove it from the symbol and surface indexes.
+        """
+        for exact, lower, all_, keys in (
+            (self.symbols, self.symbols_lower, self.symbols_all, obj.symbols),
+            (self.surfaces, self.surfaces_lower, self.surfaces_all, obj.surfaces),
+        ):
+            patches = [(exact, key) for key in keys]
+            patches += [(lower, key.lower()) for key in keys]
+            if exact is self.symbols and obj.entity.name == "currency":
+                patches += [(self.prefix_symbols, key) for key in keys]
+            for index, key in patches:
+                # Units hash by their conversion, which parses fill in later
+                objs = {item for item in index.get(key, ()) if item is not obj}
+                if not remove:
+                    objs.add(obj)
+                if objs:
+                    index[key] = objs
+                else:
+                    index.pop(key, None)
+            # The lower case index takes precedence in the merged index
+            for key in set(keys) | {key.lower() for key in keys}:
+                if key in lower:
+                    all_[key] = lower[key]
+                elif key in exact:
+                    all_[key] = exact[key]
+                else:
+                    all_.pop(key, None)
 
     @staticmethod
     def prefixed_units(name, unit):
@@ -321,7 +569,11 @@ class Units(object):
             }
 
 
-@cached
+def _layer_units(registry, base, lang=const.LANG):
+    return base.overlay(registry.units) if registry.units else base
+
+
+@scoped(_layer_units)
 def units(lang=const.LANG):
     """
     Cached unit object
@@ -329,6 +581,55 @@ def units(lang=const.LANG):
     return Units([const.GENERAL_UNITS_PATH, const.LANG_UNITS_PATH, CUSTOM_UNITS], lang)
 
 
+###############################################################################
+@cached
+def si_units(lang=const.LANG):
+    """
+    Cached SI unit table, mapping SI labels to their dimensions
+    """
+    return _load_json_dict(const.SI_UNITS_PATH)
+
+
+@cached
+def si_entities(lang=const.LANG):
+    """
+    Cached SI entity table, mapping entity names to their dimensions
+    """
+    return _load_json_dict(const.GENERAL_SI_ENTITIES_PATH)
+
+
+###############################################################################
+def _layer_data_version(registry, base, lang=const.LANG):
+    if not registry.units and not registry.entities:
+        return base
+    digest = hashlib.blake2b(base.encode("ascii"), digest_size=16)
+    custom = json.dumps([registry.units, registry.entities], sort_keys=True, default=str)
+    digest.update(custom.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@scoped(_layer_data_version)
+def data_version(lang=const.LANG):
+    """
+    Cached content hash of the unit and entity data of a language including
+    custom units and entities, those of the active registry included, changes
+    whenever any of them does
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in (
+        const.GENERAL_UNITS_PATH,
+        const.LANG_UNITS_PATH,
+        const.GENERAL_ENTITIES_PATH,
+        const.LANG_ENTITIES_PATH,
+        const.SI_UNITS_PATH,
+        const.GENERAL_SI_ENTITIES_PATH,
+    ):
+        digest.update(path.read_bytes())
+    custom = json.dumps([CUSTOM_UNITS, CUSTOM_ENTITIES], sort_keys=True, default=str)
+    digest.update(custom.encode("utf-8"))
+    return digest.hexdigest()
+
+
 ###############################################################################
 @cached
 def training_set(lang=const.LANG):
@@ -344,45 +645,173 @@ def training_set(lang=const.LANG):
 
 
 ###############################################################################
+# Custom registrations patch the loaded tables in place under this lock. The
+# unit patterns are rebuilt in a background thread and swapped in together
+# with the new data version, parses meanwhile use the previous patterns.
+_CUSTOM_LOCK = threading.RLock()
+_REBUILT = threading.Event()
+_REBUILT.set()
+_GENERATION = 0
+
+
+def _cached_results(funct):
+    """
+    Cached results of a function decorated with cached, by cache key.
+    """
+    return dict(_CACHE_DICT.get(id(funct.__wrapped__), {}))
+
+
+def _custom_units_changed(name, previous):
+    """
+    Apply a change of the custom unit name to the loaded unit tables, or drop
+    all cached data if that fails.
+    :param previous: the custom unit before the change, empty if it is new
+    """
+    global _EPOCH
+    _EPOCH += 1
+    try:
+        names = {_name for _name, _ in Units.prefixed_units(name, previous)}
+        if name in CUSTOM_UNITS:
+            names.update(
+                _name for _name, _ in Units.prefixed_units(name, CUSTOM_UNITS[name])
+            )
+        for units_ in _cached_results(units).values():
+            units_.update(names)
+        from . import tagger
+
+        _CACHE_DICT.pop(id(tagger.unit_index.__wrapped__), None)
+    except Exception:
+        _CACHE_DICT.clear()
+        return
+    _rebuild_patterns()
+
+
+def _custom_entities_changed(name):
+    """
+    Apply a change of the custom entity name to the loaded entity tables, or
+    drop all cached data if that fails.
+    """
+    global _EPOCH
+    _EPOCH += 1
+    try:
+        for entities_ in _cached_results(entities).values():
+            entities_.update(name)
+    except Exception:
+        _CACHE_DICT.clear()
+        return
+    if _REBUILT.is_set():
+        _CACHE_DICT.pop(id(data_version.__wrapped__), None)
+
+
+def _pin_data_versions():
+    """
+    Compute the data versions of the loaded languages before a change, so
+    they only move on once the new unit patterns are in place.
+    """
+    for key in _cached_results(units):
+        data_version(*key)
+
+
+def _rebuild_patterns():
+    """
+    Rebuild the cached unit patterns in a background thread.
+    """
+    global _GENERATION
+    from . import regex
+
+    if not _cached_results(regex._units_regex):
+        _CACHE_DICT.pop(id(data_version.__wrapped__), None)
+        return
+    _GENERATION += 1
+    if _REBUILT.is_set():
+        _REBUILT.clear()
+        threading.Thread(
+            target=_swap_patterns, name="quantulum3-rebuild", daemon=True
+        ).start()
+
+
+def _swap_patterns():
+    global _EPOCH
+    from . import regex
+
+    while True:
+        with _CUSTOM_LOCK:
+            generation = _GENERATION
+            keys = list(_cached_results(regex._units_regex))
+        # Compiling takes a while, registrations meanwhile start over
+        try:
+            patterns = dict((key, regex.build_units_regex(*key)) for key in keys)
+        except Exception:
+            patterns = None
+        with _CUSTOM_LOCK:
+            if patterns is None:
+                _CACHE_DICT.clear()
+            elif generation != _GENERATION:
+                continue
+            else:
+                _CACHE_DICT[id(regex._units_regex.__wrapped__)] = patterns
+                _CACHE_DICT.pop(id(data_version.__wrapped__), None)
+            _EPOCH += 1
+            _REBUILT.set()
+            return
+
+
+def wait_for_rebuild(timeout=None):
+    """
+    Wait until the unit patterns match all custom units registered so far.
+    :param timeout: seconds to wait at most, None to wait until done
+    :return: True if the patterns are up to date
+    """
+    return _REBUILT.wait(timeout)
+
+
 def add_custom_unit(name: str, **kwargs):
     """
     Adds a custom unit to the set of default units
-    Note: causes a reload of all units
+    Note: the unit is added to the loaded tables right away, the unit
+    patterns are rebuilt in the background, see wait_for_rebuild
     :param name: Name of the unit to add, should preferably be unique,
     otherwise will overwrite attributes in existing units
     :param kwargs: properties of the unit as found in units.json, i.e. surfaces=["centimetre"]
     """
-    CUSTOM_UNITS[name].update(kwargs)
-    _CACHE_DICT.clear()
+    with _CUSTOM_LOCK:
+        _pin_data_versions()
+        previous = dict(CUSTOM_UNITS.get(name, {}))
+        CUSTOM_UNITS[name].update(kwargs)
+        _custom_units_changed(name, previous)
 
 
 def remove_custom_unit(name: str):
     """
     Removes a unit from the set of custom units
-    Note: causes a reload of all units
+    Note: the unit patterns are rebuilt in the background, see wait_for_rebuild
     :param name: Name of the unit to remove. This will not affect units that are loaded per default.
     """
-    CUSTOM_UNITS.pop(name)
-    _CACHE_DICT.clear()
+    with _CUSTOM_LOCK:
+        _pin_data_versions()
+        previous = CUSTOM_UNITS.pop(name)
+        _custom_units_changed(name, previous)
 
 
 def add_custom_entity(name: str, **kwargs):
     """
     Adds a custom entity to the set of default entities
-    Note: causes a reload of all entities
+    Note: the loaded entities are updated in place
     :param name: Name of the entity to add, should preferably be unique,
     otherwise will overwrite attributes in existing entities
     :param kwargs: properties of the entity as found in entities.json, i.e. surfaces=["centimetre"]
     """
-    CUSTOM_ENTITIES[name].update(kwargs)
-    _CACHE_DICT.clear()
+    with _CUSTOM_LOCK:
+        CUSTOM_ENTITIES[name].update(kwargs)
+        _custom_entities_changed(name)
 
 
 def remove_custom_entity(name: str):
     """
     Removes an entity from the set of custom entities
-    Note: causes a reload of all entities
+    Note: the loaded entities are updated in place
     :param name: Name of the entity to remove. This will not affect entities that are loaded per default.
     """
-    CUSTOM_ENTITIES.pop(name)
-    _CACHE_DICT.clear()
+    with _CUSTOM_LOCK:
+        CUSTOM_ENTITIES.pop(name)
+        _custom_entities_changed(name)
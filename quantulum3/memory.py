@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` memory measurement functions.
+
+Report shared and private memory of forked workers (Linux only):
+
+    python -m quantulum3.memory --workers 4
+    python -m quantulum3.memory --workers 4 --no-freeze
+
+Report the memory retained by each loaded data structure and the cost of
+each language, and compare reports of two versions:
+
+    python -m quantulum3.memory --structures --json before.json
+    python -m quantulum3.memory --diff before.json after.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import signal
+import sys
+import traceback
+import tracemalloc
+import types
+from pathlib import Path
+
+from . import batch, const, language, load, parser
+
+SAMPLE_TEXTS = [
+    "Tôi muốn mua 2 lít nước và 500 g đường.",
+    "Xe chạy với tốc độ 60 km/h trên quãng đường dài hai mươi km.",
+    "I want 2 liters of wine and 500 g of cheese.",
+    "Sound travels at 0.34 km/s in air.",
+]
+
+
+###############################################################################
+def smaps(pid="self"):
+    """
+    Memory summary of a process from /proc/<pid>/smaps_rollup, in kB.
+    """
+    path = Path("/proc", str(pid), "smaps_rollup")
+    if not path.exists():
+        raise OSError("Memory measurement needs /proc/<pid>/smaps_rollup")
+    fields = {}
+    with path.open("r") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def shared_private(pid="self"):
+    """
+    Resident, proportional, shared and private memory of a process, in kB.
+    """
+    fields = smaps(pid)
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+###############################################################################
+def fork_workers(count, texts, langs=None, freeze=True):
+    """
+    Warm up, fork count workers that parse the given texts and wait for
+    them to be done, so that their memory can be measured.
+    :return: the pids of the workers, stop them with stop_workers
+    """
+    langs = langs or [const.LANG]
+    gc.disable()
+    if freeze:
+        batch.prefork_warmup(langs)
+    else:
+        for lang in langs:
+            batch.warmup(lang, True)
+            batch.warmup(lang, False)
+    pids = []
+    try:
+        for _ in range(count):
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                # Never return into the code of the parent
+                status = 1
+                try:
+                    os.close(read)
+                    gc.enable()
+                    for lang in langs:
+                        for text in texts:
+                            parser.parse(text, lang)
+                    gc.collect()
+                    os.write(write, b"1")
+                    status = 0
+                    signal.pause()
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(status)
+            os.close(write)
+            ready = os.read(read, 1)
+            os.close(read)
+            if not ready:
+                # The worker exited before it was done
+                os.waitpid(pid, 0)
+                stop_workers(pids)
+                raise RuntimeError("Worker %d failed to parse the texts" % pid)
+            pids.append(pid)
+    finally:
+        gc.enable()
+    return pids
+
+
+def stop_workers(pids):
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+def worker_report(pids):
+    """
+    Memory of each worker and the total, in kB.
+    """
+    rows = [dict(pid=pid, **shared_private(pid)) for pid in pids]
+    total = {
+        key: sum(row[key] for row in rows) for key in ("rss", "pss", "shared", "private")
+    }
+    return rows, total
+
+
+def print_worker_report(rows, total, file=sys.stdout):
+    print("%8s %10s %10s %10s %10s" % ("pid", "rss", "pss", "shared", "private"), file=file)
+    for row in rows:
+        print(
+            "%8d %10d %10d %10d %10d"
+            % (row["pid"], row["rss"], row["pss"], row["shared"], row["private"]),
+            file=file,
+        )
+    print(
+        "%8s %10d %10d %10d %10d"
+        % ("total", total["rss"], total["pss"], total["shared"], total["private"]),
+        file=file,
+    )
+
+
+###############################################################################
+# Objects shared by the whole process, never counted as part of a structure
+_SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def deep_size(obj, seen=None):
+    """
+    Bytes of an object and of everything it references, following
+    containers and instance attributes.
+    :param seen: ids of objects counted already, objects shared with an
+                 earlier structure are only counted there
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, re.Pattern)):
+            attributes = getattr(obj, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+def structures(lang=const.LANG):
+    """
+    Loaded data structures of a language, in the order they are counted.
+    :return: list of (name, list of objects)
+    """
+    batch.warmup(lang, True)
+    batch.warmup(lang, False)
+    units = load.units(lang)
+    entities = load.entities(lang)
+    cached = [
+        value for values in load._CACHE_DICT.values() for value in values.values()
+    ]
+    return [
+        ("units.names", [units.names]),
+        (
+            "units.indexes",
+            [
+                units.symbols, units.symbols_lower, units.symbols_all,
+                units.surfaces, units.surfaces_lower, units.surfaces_all,
+                units.prefix_symbols, units.derived,
+            ],
+        ),
+        ("units.unit_dict", [units.unit_dict]),
+        ("entities.names", [entities.names]),
+        ("entities.derived", [entities.derived]),
+        ("regex", [value for value in cached if isinstance(value, re.Pattern)]),
+        ("common_words", [language.get("load", lang).COMMON_WORDS]),
+        ("custom", [load.CUSTOM_UNITS, load.CUSTOM_ENTITIES]),
+        ("other cached", [value for value in cached if not isinstance(value, re.Pattern)]),
+    ]
+
+
+def structure_report(lang=const.LANG):
+    """
+    Bytes retained by each data structure of a loaded language. Objects
+    referenced by several structures are counted once, under the first.
+    """
+    seen = set()
+    report = {}
+    for name, objects in structures(lang):
+        report[name] = sum(deep_size(obj, seen) for obj in objects)
+    return report
+
+
+def language_costs(langs):
+    """
+    Memory allocated by loading each language in turn, the first one also
+    loads the data shared by all languages. Only meaningful in a process that
+    has not loaded any language yet.
+    :return: dict of language to bytes
+    """
+    costs = {}
+    tracemalloc.start()
+    try:
+        for lang in langs:
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            batch.warmup(lang, True)
+            batch.warmup(lang, False)
+            gc.collect()
+            costs[lang] = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return costs
+
+
+def diff_reports(old, new):
+    """
+    :return: list of (section, key, old value, new value) of two reports
+    """
+    rows = []
+    for section in ("languages", "structures"):
+        old_section = old.get(section, {})
+        new_section = new.get(section, {})
+        for key in sorted(set(old_section) | set(new_section)):
+            if isinstance(new_section.get(key, old_section.get(key)), dict):
+                for name in sorted(
+                    set(old_section.get(key, {})) | set(new_section.get(key, {}))
+                ):
+                    rows.append(
+                        (
+                            "%s %s" % (section, key),
+                            name,
+                            old_section.get(key, {}).get(name, 0),
+                            new_section.get(key, {}).get(name, 0),
+                        )
+                    )
+            else:
+                rows.append((section, key, old_section.get(key, 0), new_section.get(key, 0)))
+    return rows
+
+
+def _kib(size):
+    return size / 1024.0
+
+
+###############################################################################
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Report shared and private memory (kB) of forked workers, "
+        "or the memory of each loaded data structure"
+    )
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--lang", action="append", default=None)
+    arg_parser.add_argument(
+        "--no-freeze", dest="freeze", action="store_false",
+        help="warm up without gc.freeze() for comparison",
+    )
+    arg_parser.add_argument(
+        "--input", type=Path, default=None,
+        help="text file parsed by every worker, one document per line",
+    )
+    arg_parser.add_argument(
+        "--structures", action="store_true",
+        help="report the memory of each data structure and language instead",
+    )
+    arg_parser.add_argument("--json", type=Path, default=None, help="also write it here")
+    arg_parser.add_argument(
+        "--diff", nargs=2, type=Path, default=None, metavar=("OLD", "NEW"),
+        help="compare two reports written with --structures --json",
+    )
+    args = arg_parser.parse_args(argv)
+
+    if args.diff:
+        old, new = (json.loads(path.read_text(encoding="utf-8")) for path in args.diff)
+        print("%-40s %12s %12s %12s" % ("structure", "old (KiB)", "new (KiB)", "change"))
+        for section, name, old_size, new_size in diff_reports(old, new):
+            print(
+                "%-40s %12.1f %12.1f %+12.1f"
+                % ("%s %s" % (section, name), _kib(old_size), _kib(new_size),
+                   _kib(new_size - old_size))
+            )
+        return
+    if args.structures:
+        langs = args.lang or [const.LANG]
+        report = {"languages": language_costs(langs), "structures": {}}
+        for lang in langs:
+            report["structures"][lang] = structure_report(lang)
+        for lang in langs:
+            print("%s: %.1f KiB allocated by loading" % (lang, _kib(report["languages"][lang])))
+            for name, size in report["structures"][lang].items():
+                print("  %-24s %12.1f KiB" % (name, _kib(size)))
+        if args.json:
+            args.json.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        return
+
+    texts = SAMPLE_TEXTS
+    if args.input:
+        with args.input.open("r", encoding="utf-8") as file:
+            texts = [line.rstrip("\n") for line in file]
+
+    pids = fork_workers(args.workers, texts, args.lang, args.freeze)
+    try:
+        rows, total = worker_report(pids)
+    finally:
+        stop_workers(pids)
+    print("gc.freeze: %s" % ("yes" if args.freeze else "no"))
+    print_worker_report(rows, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` metrics registry, exported in the Prometheus text format or
+as a dictionary.
+"""
+
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets in seconds, 1 us to 2 min
+LATENCY_BUCKETS = [1e-6 * 2 ** (i / 4) for i in range(108)]
+# Bucket bounds exported to Prometheus, powers of two
+EXPORT_BUCKETS = LATENCY_BUCKETS[::4]
+
+
+###############################################################################
+class LatencyHistogram(object):
+    """
+    Histogram of per-document parse times with constant memory.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def update(self, other):
+        """
+        Add the times of another histogram with the same buckets.
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given fraction of all times,
+        at most the maximal time.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank and index < len(self.buckets):
+                return min(self.buckets[index], self.max)
+            if count and seen >= rank:
+                return self.max
+        return 0.0
+
+    def cumulative(self, bounds):
+        """
+        Number of times up to each of the given bucket bounds.
+        """
+        counts, seen, index = [], 0, 0
+        for bound in bounds:
+            while index < len(self.buckets) and self.buckets[index] <= bound:
+                seen += self.counts[index]
+                index += 1
+            counts.append(seen)
+        return counts
+
+
+###############################################################################
+class Metric(object):
+    """
+    Values of a metric per combination of label values. Updates hold a lock
+    for a single dictionary operation.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _label_text(self, label_values, extra=()):
+        pairs = list(zip(self.labels, label_values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join(
+            '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for name, value in pairs
+        )
+
+    def drain(self):
+        """
+        Take all values, leaving the metric empty.
+        """
+        with self._lock:
+            values, self.values = self.values, {}
+        return values
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def merge(self, values):
+        for labels, amount in values.items():
+            self.inc(amount, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {"labels": dict(zip(self.labels, labels)), "value": value}
+                for labels, value in self.values.items()
+            ]
+
+    def prometheus(self):
+        with self._lock:
+            return [
+                "%s%s %s" % (self.name, self._label_text(labels), value)
+                for labels, value in sorted(self.values.items())
+            ]
+
+
+class Gauge(Counter):
+
+    kind = "gauge"
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            histogram = self.values.get(labels)
+            if histogram is None:
+                histogram = self.values[labels] = LatencyHistogram()
+            histogram.add(value)
+
+    def merge(self, values):
+        with self._lock:
+            for labels, other in values.items():
+                self.values.setdefault(labels, LatencyHistogram()).update(other)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(zip(self.labels, labels)),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "max": histogram.max,
+                    "p50": histogram.percentile(0.5),
+                    "p99": histogram.percentile(0.99),
+                }
+                for labels, histogram in self.values.items()
+            ]
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            for labels, histogram in sorted(self.values.items()):
+                counts = histogram.cumulative(EXPORT_BUCKETS)
+                for bound, count in zip(EXPORT_BUCKETS, counts):
+                    lines.append(
+                        "%s_bucket%s %d"
+                        % (self.name, self._label_text(labels, [("le", "%g" % bound)]), count)
+                    )
+                lines.append(
+                    "%s_bucket%s %d"
+                    % (self.name, self._label_text(labels, [("le", "+Inf")]), histogram.count)
+                )
+                lines.append("%s_sum%s %s" % (self.name, self._label_text(labels), histogram.total))
+                lines.append("%s_count%s %d" % (self.name, self._label_text(labels), histogram.count))
+        return lines
+
+
+###############################################################################
+class Registry(object):
+    """
+    Named metrics of a process.
+    """
+
+    def __init__(self):
+
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, metric_class, name, help_text, labels):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, help_text, labels)
+            elif not isinstance(metric, metric_class):
+                raise ValueError("Metric %s is a %s" % (name, metric.kind))
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=()):
+        return self._get(Histogram, name, help_text, labels)
+
+    def snapshot(self):
+        """
+        Dictionary of all metrics and their values per label combination.
+        """
+        return {
+            name: {"type": metric.kind, "help": metric.help, "values": metric.snapshot()}
+            for name, metric in sorted(self.metrics.items())
+        }
+
+    def prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append("# HELP %s %s" % (name, metric.help))
+            lines.append("# TYPE %s %s" % (name, metric.kind))
+            lines += metric.prometheus()
+        return "\n".join(lines) + "\n"
+
+    def drain(self):
+        """
+        Take the values of all counters and histograms, e.g. to send them from
+        a worker process to its parent.
+        :return: picklable values for merge
+        """
+        return {
+            name: metric.drain()
+            for name, metric in self.metrics.items()
+            if metric.kind != "gauge"
+        }
+
+    def merge(self, drained):
+        """
+        Add values taken from another registry with drain.
+        """
+        for name, values in drained.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+REGISTRY = Registry()
+
+###############################################################################
+# Metrics of the library
+DOCUMENTS = REGISTRY.counter(
+    "quantulum3_documents_total", "Documents parsed in batch and service modes.", ("lang",)
+)
+QUANTITIES = REGISTRY.counter(
+    "quantulum3_quantities_total", "Extracted quantities by entity.", ("entity",)
+)
+TRUNCATED = REGISTRY.counter(
+    "quantulum3_truncated_total", "Documents whose parse was cut short by a deadline."
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    "quantulum3_parse_seconds", "Parse time per document.", ("lang",)
+)
+PARSE_ERRORS = REGISTRY.counter(
+    "quantulum3_parse_errors_total", "Regex matches dropped because of a ValueError."
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "quantulum3_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result")
+)
+SI_ENTITY_FALLBACKS = REGISTRY.counter(
+    "quantulum3_si_entity_fallbacks_total",
+    "Entities looked up in the SI entity table, as no known entity matched.",
+)
+
+
+def record_document(result, lang, seconds=None):
+    """
+    Count a parsed document and its quantities.
+    :param result: ParseResult of Quantity or CompactQuantity objects
+    :param seconds: parse time, defaults to result.seconds
+    """
+    DOCUMENTS.inc(1, (lang,))
+    seconds = seconds if seconds is not None else getattr(result, "seconds", None)
+    if seconds is not None:
+        PARSE_SECONDS.observe(seconds, (lang,))
+    if getattr(result, "truncated", False):
+        TRUNCATED.inc()
+    for quantity in result:
+        entity = getattr(quantity, "entity", None)
+        if entity is None:
+            entity = quantity.unit.entity.name
+        QUANTITIES.inc(1, (entity,))
@@ -4,18 +4,39 @@
 :mod:`Quantulum` parser.
 """
 import quantulum3 as q
-import json
+import bisect
+import copy
+import logging
+import mmap
+import os
 import re
-from collections import defaultdict
+import time
 from fractions import Fraction
-from typing import List, Any
+from typing import Any, Iterator, List
 
+from . import chunking
 from . import classes as cls
 from . import disambiguate as dis
-from . import language, load, const
+from . import language, load, const, metrics, profiling
 from . import regex as reg
 
 
+# Dashes separating the two ends of a range, see clean_text
+RANGE_DASHES = ("-", "–", "−")
+
+# Optional stages of a parse, see QuantityExtractor
+STAGES = (
+    "spell_out",
+    "join_words",
+    "heuristics",
+    "common_words",
+    "quote_check",
+    "merge_ranges",
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
 def _get_parser(lang=const.LANG):
     """
     Get parser module for given language
@@ -26,6 +47,7 @@ def _get_parser(lang=const.LANG):
 
 
 ###############################################################################
+@profiling.stage("extract_spell_out_values")
 def extract_spell_out_values(text, has_value, lang=const.LANG):
     """
     Convert spelled out numbers in a given text to digits.
@@ -34,24 +56,53 @@ def extract_spell_out_values(text, has_value, lang=const.LANG):
 
 
 ###############################################################################
+@profiling.stage("substitute_values")
 def substitute_values(text, values):
     """
     Convert spelled out numbers in a given text to digits.
+    :param values: substitutions sorted by their old_span
+    :return: (new text, Shifts of the new text against the old one)
     """
 
-    shift, final_text, shifts = 0, text, defaultdict(int)
+    shift, position, pieces, shifts = 0, 0, [], Shifts()
     for value in values:
-        first = value["old_span"][0] + shift
-        second = value["old_span"][1] + shift
-        final_text = final_text[0:first] + value["new_surface"] + final_text[second:]
+        start, end = value["old_span"]
+        pieces.append(text[position:start])
+        pieces.append(value["new_surface"])
+        position = end
+        first = start + shift
         shift += len(value["new_surface"]) - len(value["old_surface"])
-        for char in range(first + 1, len(final_text)):
-            shifts[char] = shift
+        shifts.add(first + 1, shift)
+    pieces.append(text[position:])
+
+    return "".join(pieces), shifts
+
+
+class Shifts(object):
+    """
+    Shift of each position of a substituted text against the original text,
+    stored once per substitution rather than per character.
+    """
+
+    def __init__(self):
+
+        self.starts = []
+        self.shifts = []
+
+    def add(self, start, shift):
+        """
+        Shift positions from start on, start increases with each call.
+        """
+        self.starts.append(start)
+        self.shifts.append(shift)
 
-    return final_text, shifts
+    def __getitem__(self, index):
+        position = bisect.bisect_right(self.starts, index) - 1
+        return self.shifts[position] if position >= 0 else 0
 
 
 ###############################################################################
+@profiling.stage("get_values")
 def get_values(item, lang=const.LANG):
     """
     Extract value from regex hit.
@@ -76,13 +127,15 @@ def get_values(item, lang=const.LANG):
 
     value = re.sub(fractions, callback, value, re.IGNORECASE)
 
+    # Separators are searched from the start of digit runs only, so that
+    # long runs are scanned once instead of once per digit
     range_separator = re.findall(
-        r"\d+ ?((?:-\ )?(?:%s)) ?\d" % "|".join(reg.ranges(lang)), value
+        r"(?<!\d)\d+ ?((?:-\ )?(?:%s)) ?\d" % "|".join(reg.ranges(lang)), value
     )
     uncertain_separator = re.findall(
-        r"\d+ ?(%s) ?\d" % "|".join(reg.uncertainties(lang)), value
+        r"(?<!\d)\d+ ?(%s) ?\d" % "|".join(reg.uncertainties(lang)), value
     )
-    fraction_separator = re.findall(r"\d+/\d+", value)
+    fraction_separator = re.findall(r"(?<!\d)\d+/\d+", value)
 
     value = re.sub(" +", " ", value)
     uncertainty = None
@@ -197,8 +250,7 @@ def get_conversion_from_dimensions(dimensions, lang='vi'):
             conversion_dict.append({"base": si_label, "power": dim})
             res = res * (factor ** dim)
         # print(conversion_dict)
-        si_units = json.load(open(const.SI_UNITS_PATH))
-        for si, value in si_units.items():
+        for si, value in load.si_units().items():
             if value['dimensions'] == conversion_dict:
                 return {"silabel": si, "factor": res}
     except KeyError:
@@ -216,6 +268,8 @@ def get_unit_from_dimensions(dimensions, text, lang=const.LANG):
         if unit.conversion is not None:
             if len(unit.conversion) == 0:
                 unit.conversion = get_conversion_from_dimensions(dimensions)
+        # Work on a copy, the loaded unit is shared between all parses
+        unit = copy.copy(unit)
 
     except KeyError:
         unit = cls.Unit(
@@ -274,8 +328,9 @@ def get_entity_from_dimensions(dimensions, lang=const.LANG):
     key = load.get_key_from_dimensions(final_derived)
     ent = dis.disambiguate_entity(key, lang)
     if ent is None:
+        metrics.SI_ENTITY_FALLBACKS.inc()
         try:
-            si_entities = json.load(open(const.GENERAL_SI_ENTITIES_PATH, encoding='utf-8'))
+            si_entities = load.si_entities(lang)
             entity_dimensions = {}
             for item in key:
                 for dim in si_entities[item[0]]['dimensions']:
@@ -304,6 +359,7 @@ def parse_unit(item, unit, slash, lang=const.LANG):
 
 
 ###############################################################################
+@profiling.stage("get_unit")
 def get_unit(item, text, lang=const.LANG):
     """
     Extract unit from regex hit.
@@ -316,7 +372,7 @@ def get_unit(item, text, lang=const.LANG):
     item_units = [item.group(i) for i in group_units if item.group(i)]
 
     if len(item_units) == 0:
-        unit = load.units(lang).names["dimensionless"]
+        unit = copy.copy(load.units(lang).names["dimensionless"])
     else:
         derived: List[Any]
         derived, slash = [], False
@@ -364,11 +420,16 @@ def get_unit(item, text, lang=const.LANG):
 
                 derived += [{"base": base, "power": power, "surface": unit_surface}]
 
-        unit = get_unit_from_dimensions(derived, text, lang)
+        if derived:
+            unit = get_unit_from_dimensions(derived, text, lang)
+        else:
+            # All units were cut because of inconsistent operators
+            unit = copy.copy(load.units(lang).names["dimensionless"])
     return unit, unit_shortening
 
 
 ###############################################################################
+@profiling.stage("get_surface")
 def get_surface(shifts, orig_text, item, text, unit_shortening=0):
     """
     Extract surface from regex hit.
@@ -397,42 +458,72 @@ def get_surface(shifts, orig_text, item, text, unit_shortening=0):
 
 
 ###############################################################################
-def is_quote_artifact(orig_text, span):
+def is_quote_artifact(orig_text, span, quotes=None):
     """
     Distinguish between quotes and units.
+    :param quotes: find_quotes(orig_text) if already known
     """
 
-    res = False
-    cursor = re.finditer(r'["\'][^ .,:;?!()*+-].*?["\']', orig_text)
+    quotes, ends = quotes if quotes is not None else find_quotes(orig_text)
+    index = bisect.bisect_left(ends, span[0])
+    if index < len(ends) and ends[index] <= span[1]:
+        return quotes[index]
+    return False
 
-    for item in cursor:
-        if span[0] <= item.span()[1] <= span[1]:
-            res = item
-            break
 
-    return res
+def find_quotes(text):
+    """
+    Quoted passages of a text and their ends, found once per parse instead of
+    once per quantity. The passages do not overlap, so their ends increase.
+    """
+    quotes = list(re.finditer(r'["\'][^ .,:;?!()*+-].*?["\']', text))
+    return quotes, [quote.end() for quote in quotes]
 
 
 ###############################################################################
+@profiling.stage("build_quantity")
 def build_quantity(
         orig_text, text, item, values, unit, surface, span, uncert, lang=const.LANG,
+        stages=STAGES, quotes=None,
 ):
     """
     Build a Quantity object out of extracted information.
     Takes care of caveats and common errors
+    :param stages: enabled optional stages, see STAGES
+    :param quotes: find_quotes(text) if already known
     """
     return _get_parser(lang).build_quantity(
-        orig_text, text, item, values, unit, surface, span, uncert
+        orig_text, text, item, values, unit, surface, span, uncert, stages, quotes
     )
 
 
 ###############################################################################
-def clean_text(text, lang=const.LANG):
+@profiling.stage("clean_text")
+def clean_text(text, lang=const.LANG, join_words=True):
     """
     Clean text before parsing.
+    :param join_words: join the words of multi-word numbers with underscores
     """
 
+    if join_words:
+        for word in _special_words(lang):
+            if word in text:
+                text = text.replace(word, word.replace(' ', '_'))
+
     # Replace a few nasty unicode characters with their ASCII equivalent
+    maps = {"×": "x", "–": "-", "−": "-", "-": "-"}
+    for element in maps:
+        text = text.replace(element, maps[element])
+    # Language specific cleaning
+    text = _get_parser(lang).clean_text(text)
+    return text
+
+
+@load.cached
+def _special_words(lang=const.LANG):
+    """
+    Multi-word numbers, spelled with spaces.
+    """
     special_words = []
     special_words.extend([word.replace('_', ' ') for word in reg.units() if '_' in word])
     special_words.extend([word.replace('_', ' ') for word in reg.tens() if '_' in word])
@@ -442,87 +533,376 @@ def clean_text(text, lang=const.LANG):
             special_words.extend([word.replace('_', ' ') for word in scale if '_' in word])
         elif '_' in scale:
             special_words.append(scale.replace('_', ' '))
-
-    for word in special_words:
-        if word in text:
-            text = text.replace(word, word.replace(' ', '_'))
-
-    maps = {"×": "x", "–": "-", "−": "-", "-": "-"}
-    for element in maps:
-        text = text.replace(element, maps[element])
-    # Language specific cleaning
-    text = _get_parser(lang).clean_text(text)
-    return text
+    return special_words
 
 
 ###############################################################################
-def parse(text, lang=const.LANG, has_value=True) -> List[cls.Quantity]:
+@profiling.stage("parse")
+def parse(
+    text, lang=const.LANG, has_value=True, deadline=None, cache=None, registry=None
+) -> cls.ParseResult:
     """
     Extract all quantities from unstructured text.
-    """
+    :param deadline: optional time.monotonic() value, once it has passed no
+                     further quantities are extracted and the result is
+                     flagged as truncated
+    :param cache: optional cache.ResultCache, reusing the quantities of
+                  sentences parsed before
+    :param registry: optional registry.Registry of custom units and entities
+                     used instead of those of the process
+    """
+    if registry is not None:
+        with registry.active():
+            return parse(text, lang, has_value, deadline, cache)
+    if cache is not None:
+        return cache.parse(text, lang, has_value, deadline)
+    result = cls.ParseResult()
+    result.extend(_iter_parse(text, lang, has_value, deadline, result))
+    return result
+
+
+def iter_parse(
+    text, lang=const.LANG, has_value=True, deadline=None, result=None
+) -> Iterator[cls.Quantity]:
+    """
+    Extract all quantities from unstructured text, yielding each quantity as
+    soon as it is final. Ranges are merged with a lookahead of one quantity.
+    :param deadline: optional time.monotonic() value after which no further
+                     quantities are extracted
+    :param result: optional classes.ParseResult, flagged as truncated if the
+                   deadline stops the iteration; quantities are not added
+    """
+    return _iter_parse(text, lang, has_value, deadline, result)
+
+
+class QuantityExtractor(object):
+    """
+    Reusable parse pipeline of one language with switches for the optional
+    stages, trading accuracy for speed on texts that do not need them. All
+    patterns are compiled on creation.
+
+        >>> extractor = QuantityExtractor(spell_out=False, quote_check=False)
+        >>> extractor.parse("I want 2 liters of wine")
+    """
+
+    def __init__(
+        self,
+        lang=const.LANG,
+        has_value=True,
+        spell_out=True,
+        join_words=True,
+        heuristics=True,
+        common_words=True,
+        quote_check=True,
+        merge_ranges=True,
+        registry=None,
+    ):
+        """
+        :param spell_out: convert spelled out numbers to values
+        :param join_words: join the words of multi-word numbers, see clean_text
+        :param heuristics: read "absolute" as kelvin, "1990s" as a decade and
+                           "1am", "5.12 pm" as times rather than lengths
+        :param common_words: cut unit surfaces that are common words
+        :param quote_check: cut quotes mistaken for inches
+        :param merge_ranges: merge "1-2 m" into one quantity
+        :param registry: optional registry.Registry of custom units
+        """
+        self.lang = lang
+        self.has_value = has_value
+        self.registry = registry
+        switches = (
+            spell_out, join_words, heuristics, common_words, quote_check, merge_ranges
+        )
+        self.stages = frozenset(
+            stage for stage, enabled in zip(STAGES, switches) if enabled
+        )
+        self.warmup()
+
+    def __repr__(self):
+
+        msg = "QuantityExtractor(lang=%r, has_value=%r, disabled=%s)"
+        msg = msg % (
+            self.lang,
+            self.has_value,
+            [stage for stage in STAGES if stage not in self.stages],
+        )
+        return msg
+
+    def warmup(self):
+        """
+        Load the units and compile the patterns the enabled stages use.
+        """
+        if self.registry is not None:
+            with self.registry.active():
+                return self._warmup()
+        return self._warmup()
+
+    def _warmup(self):
+        load.units(self.lang)
+        reg.units_regex(self.lang, self.has_value)
+        if "join_words" in self.stages:
+            _special_words(self.lang)
+        if "spell_out" in self.stages:
+            reg.text_pattern_reg(self.lang)
+            reg.number_words(self.lang)
+            reg.numberwords_regex(self.lang)
+
+    @profiling.stage("parse")
+    def parse(self, text, deadline=None) -> cls.ParseResult:
+        """
+        Extract all quantities from unstructured text, see parse.
+        """
+        if self.registry is not None:
+            with self.registry.active():
+                return self._parse(text, deadline)
+        return self._parse(text, deadline)
+
+    def _parse(self, text, deadline):
+        result = cls.ParseResult()
+        result.extend(
+            _iter_parse(text, self.lang, self.has_value, deadline, result, self.stages)
+        )
+        return result
+
+    def iter_parse(self, text, deadline=None, result=None) -> Iterator[cls.Quantity]:
+        """
+        Extract all quantities from unstructured text, see iter_parse.
+        """
+        quantities = _iter_parse(
+            text, self.lang, self.has_value, deadline, result, self.stages
+        )
+        if self.registry is None:
+            return quantities
+        return self._iter_scoped(quantities)
+
+    def _iter_scoped(self, quantities):
+        # The registry is only active while the pipeline runs, not in between
+        while True:
+            with self.registry.active():
+                quantity = next(quantities, None)
+            if quantity is None:
+                return
+            yield quantity
+
+
+def _iter_parse(text, lang, has_value, deadline, result=None, stages=STAGES):
     orig_text = text
 
-    text = clean_text(text, lang)
-    values = extract_spell_out_values(text, has_value, lang)
+    text = clean_text(text, lang, "join_words" in stages)
+    values = []
+    if "spell_out" in stages:
+        values = extract_spell_out_values(text, has_value, lang)
     text, shifts = substitute_values(text, values)
 
-    quantities = []
-    for item in reg.units_regex(lang, has_value).finditer(text):
+    quantities = _iter_quantities(
+        orig_text, text, values, shifts, lang, has_value, deadline, result, stages
+    )
+    if has_value and "merge_ranges" in stages:
+        quantities = profiling.iterate(
+            "merge_unit", _merge_ranges(quantities, text, orig_text)
+        )
+    yield from quantities
+
+
+def _iter_quantities(
+    orig_text, text, values, shifts, lang, has_value, deadline=None, result=None,
+    stages=STAGES,
+):
+    """
+    Yield the quantities of all regex hits in the cleaned text, stopping
+    between hits once the deadline has passed.
+    """
+    if not has_value:
+        # Without values every hit carries all spelled out values
+        spelled_out = [value["new_surface"] for value in values] or [0]
+    quotes = find_quotes(text) if "quote_check" in stages else None
+    items = reg.units_regex(lang, has_value).finditer(text)
+    for item in profiling.iterate("units_regex", items):
+        if deadline is not None and time.monotonic() >= deadline:
+            if result is not None:
+                result.truncated = True
+            return
         if item.group() != '':
             try:
                 if has_value:
                     uncertain, _values = get_values(item, lang)
                 else:
                     uncertain = None
-                    _values = []
-                    for v in values:
-                        _values.append(v['new_surface'])
-                    if len(_values) == 0:
-                        _values = [0]
+                    # Shared by all hits, build_quantity does not modify values
+                    _values = spelled_out
 
                 unit, unit_shortening = get_unit(item, text)
                 surface, span = get_surface(shifts, orig_text, item, text, unit_shortening)
                 objs = build_quantity(
-                    orig_text, text, item, _values, unit, surface, span, uncertain, lang
+                    orig_text, text, item, _values, unit, surface, span, uncertain,
+                    lang, stages, quotes,
                 )
                 if objs is not None:
-                    quantities += objs
+                    yield from objs
             except ValueError as err:
-                print("Could not parse quantity: %s", err)
-    if has_value:
-        try:
-            quantities = merge_unit(quantities, text)
-        except:
-            pass
-    return quantities
+                metrics.PARSE_ERRORS.inc()
+                _LOGGER.debug("Could not parse quantity: %s", err)
+
+
+def _is_range(first, second, text):
+    """
+    Whether two consecutive quantities of the same kind form a range
+    :param text: text the spans of the quantities refer to
+    """
+    first_conversion = first.unit.conversion
+    second_conversion = second.unit.conversion
+    if not first_conversion or not second_conversion:
+        return False
+    if first_conversion['silabel'] != second_conversion['silabel']:
+        return False
+    between = text[first.span[0]:second.span[0]]
+    return any(dash in between for dash in RANGE_DASHES)
+
+
+def _merge_ranges(quantities, text, orig_text=None):
+    """
+    Merge consecutive quantities forming a range, holding back at most one
+    quantity.
+    """
+    pending = None
+    for quantity in quantities:
+        if pending is None:
+            pending = quantity
+        elif _is_range(pending, quantity, text if orig_text is None else orig_text):
+            first_value = pending.value
+            second_value = quantity.value * quantity.unit.conversion['factor'] / pending.unit.conversion['factor']
+            span = (pending.span[0], quantity.span[1])
+            yield cls.Quantity(
+                value=(first_value + second_value) / 2,
+                unit=pending.unit,
+                surface=orig_text[span[0]:span[1]] if orig_text is not None else None,
+                span=span,
+                uncertainty=(second_value - first_value) / 2,
+                lang=pending.lang,
+            )
+            pending = None
+        else:
+            yield pending
+            pending = quantity
+    if pending is not None:
+        yield pending
 
 
 def merge_unit(quantities, text):
     """
     Handle "124 keV - 300+ GeV" --> "150 000 000 keV"
     """
-    new_quantities = []
-    i = 0
-    while i < len(quantities) - 1:
-        if quantities[i].unit.conversion['silabel'] == quantities[i+1].unit.conversion['silabel']:
-            start = quantities[i].span[0]
-            end = quantities[i+1].span[0]
-            if '-' in text[start:end]:
-                first_value = quantities[i].value
-                second_value = quantities[i+1].value * quantities[i+1].unit.conversion['factor'] / quantities[i].unit.conversion['factor']
-                new_quantity = cls.Quantity(
-                    value=(first_value + second_value) / 2,
-                    unit=quantities[i].unit,
-                    uncertainty=(second_value - first_value) / 2
-                )
-                new_quantities.append(new_quantity)
-                i += 2
-        else:
-            new_quantities.append(quantities[i])
-            i += 1
-    if i == len(quantities) - 1:
-        new_quantities.append(quantities[i])
-    return new_quantities
+    return list(_merge_ranges(quantities, text))
+
+
+###############################################################################
+def _shift(quantity, offset):
+    """
+    Move the span of a quantity by offset characters
+    """
+    quantity.span = (quantity.span[0] + offset, quantity.span[1] + offset)
+    return quantity
+
+
+def _window_quantities(quantities, offset, core_start, core_end):
+    """
+    Quantities of a window that start inside its core, with global spans.
+    """
+    for quantity in quantities:
+        if core_start <= quantity.span[0] + offset < core_end:
+            yield _shift(quantity, offset)
+
+
+def iter_parse_large(
+    text,
+    lang=const.LANG,
+    has_value=True,
+    window=chunking.WINDOW_SIZE,
+    overlap=chunking.OVERLAP,
+) -> Iterator[cls.Quantity]:
+    """
+    Extract all quantities from a large text, parsing one window at a time.
+    Windows end at sentence or whitespace boundaries and overlap, spans are
+    offsets in the whole text.
+    """
+    for start, core_start, core_end, end in chunking.windows(text, window, overlap):
+        quantities = iter_parse(text[start:end], lang, has_value)
+        yield from _window_quantities(quantities, start, core_start, core_end)
+
+
+def parse_large(
+    text,
+    lang=const.LANG,
+    has_value=True,
+    window=chunking.WINDOW_SIZE,
+    overlap=chunking.OVERLAP,
+    workers=None,
+    backend="serial",
+) -> List[cls.Quantity]:
+    """
+    Extract all quantities from a large text, see iter_parse_large.
+    With a parallel backend (see batch.parse_many) the windows are parsed
+    by workers.
+    """
+    if backend == "serial":
+        return list(iter_parse_large(text, lang, has_value, window, overlap))
+    from . import batch
+
+    bounds = list(chunking.windows(text, window, overlap))
+    results = batch.parse_many(
+        [text[start:end] for start, _, _, end in bounds],
+        lang,
+        has_value,
+        workers=workers,
+        backend=backend,
+    )
+    quantities = []
+    for (start, core_start, core_end, _), result in zip(bounds, results):
+        quantities += _window_quantities(result, start, core_start, core_end)
+    return quantities
+
+
+def iter_parse_file(
+    path,
+    lang=const.LANG,
+    has_value=True,
+    encoding="utf-8",
+    window=chunking.WINDOW_SIZE,
+    overlap=chunking.OVERLAP,
+) -> Iterator[cls.Quantity]:
+    """
+    Extract all quantities from a text file of any size, memory-mapping it and
+    parsing one window at a time, see iter_parse_large. Spans are character
+    offsets in the whole file.
+    :param encoding: ASCII compatible encoding of the file
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for text, offset, core_start, core_end in chunking.file_windows(
+                data, window, overlap, encoding
+            ):
+                quantities = iter_parse(text, lang, has_value)
+                yield from _window_quantities(quantities, offset, core_start, core_end)
+
+
+def parse_file(path, lang=const.LANG, has_value=True, **kwargs) -> List[cls.Quantity]:
+    """
+    Extract all quantities from a text file, see iter_parse_file.
+    """
+    return list(iter_parse_file(path, lang, has_value, **kwargs))
+
+
+###############################################################################
+def parse_many(texts, lang=const.LANG, has_value=True, **kwargs):
+    """
+    Extract all quantities from many texts, see batch.parse_many for the
+    worker, backend and chunking options.
+    """
+    from . import batch
+
+    return batch.parse_many(texts, lang, has_value, **kwargs)
 
 
 ###############################################################################
@@ -533,11 +913,12 @@ def inline_parse(text):  # pragma: no cover
 
     parsed = parse(text)
 
-    shift = 0
+    pieces, position = [], 0
     for quantity in parsed:
-        index = quantity.span[1] + shift
-        to_add = u" {" + str(quantity) + u"}"
-        text = text[0:index] + to_add + text[index:]
-        shift += len(to_add)
+        index = max(quantity.span[1], position)
+        pieces.append(text[position:index])
+        pieces.append(u" {" + str(quantity) + u"}")
+        position = index
+    pieces.append(text[position:])
 
-    return text
+    return "".join(pieces)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` persistent cache of parse results in a SQLite file.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from . import batch
+from . import classes as cls
+from . import const, load, metrics, parser
+
+# Default cap of the stored results in bytes
+MAX_BYTES = 1 << 30
+# Keys per statement, below the SQLite variable limit
+_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    version TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+###############################################################################
+def key(text, lang=const.LANG, has_value=True):
+    """
+    Hash of a text, its parse options and the data version of lang.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(lang.encode("utf-8") + b"\0")
+    digest.update(b"1" if has_value else b"0")
+    digest.update(load.data_version(lang).encode("ascii"))
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+def dumps(quantities):
+    """
+    Serialize quantities to compressed CompactQuantity records.
+    """
+    records = [
+        tuple(quantity) if isinstance(quantity, batch.CompactQuantity)
+        else tuple(batch.compact(quantity))
+        for quantity in quantities
+    ]
+    return zlib.compress(json.dumps(records, ensure_ascii=False).encode("utf-8"))
+
+
+def loads(data):
+    """
+    Deserialize the CompactQuantity records of dumps.
+    """
+    records = json.loads(zlib.decompress(data).decode("utf-8"))
+    return [
+        batch.CompactQuantity(
+            value=value,
+            unit=unit,
+            entity=entity,
+            dimensions=tuple(tuple(i) for i in dimensions),
+            surface=surface,
+            span=tuple(span),
+            uncertainty=uncertainty,
+        )
+        for value, unit, entity, dimensions, surface, span, uncertainty in records
+    ]
+
+
+###############################################################################
+class SQLiteCache(object):
+    """
+    Cache of the quantities of whole documents in a SQLite file, kept across
+    runs. Entries are keyed by the text and load.data_version, so changes to
+    the unit and entity data files or custom units make old entries
+    unreachable; they are evicted first once the file grows beyond max_bytes.
+    Any number of threads and processes may use the same file, the database
+    runs in WAL mode. Instances are picklable and reconnect after unpickling.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, timeout=30.0):
+        """
+        :param path: path of the SQLite file, created if missing
+        :param max_bytes: cap of the stored, compressed results
+        :param timeout: seconds to wait for a lock held by another process
+        """
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+
+        msg = "SQLiteCache(path=%s, hits=%d, misses=%d, evictions=%d)"
+        msg = msg % (self.path, self.hits, self.misses, self.evictions)
+        return msg
+
+    def stats(self):
+        """
+        Hit, miss and eviction counts of this instance, size of the file.
+        """
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    ###########################################################################
+    def get_many(self, texts, lang=const.LANG, has_value=True, compact_results=False):
+        """
+        Look up many documents at once.
+        :return: list with a ParseResult per text, None where it is not cached
+        """
+        keys = [key(text, lang, has_value) for text in texts]
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(keys), _BATCH):
+                part = keys[start:start + _BATCH]
+                rows = connection.execute(
+                    "SELECT key, data FROM results WHERE key IN (%s)"
+                    % ",".join("?" * len(part)),
+                    part,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                with connection:
+                    connection.execute("BEGIN")
+                    connection.executemany(
+                        "UPDATE results SET accessed = ? WHERE key = ?",
+                        [(now, entry_key) for entry_key in found],
+                    )
+            hits = sum(entry_key in found for entry_key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        metrics.CACHE_LOOKUPS.inc(hits, ("sqlite", "hit"))
+        metrics.CACHE_LOOKUPS.inc(len(keys) - hits, ("sqlite", "miss"))
+
+        results = []
+        for entry_key in keys:
+            if entry_key not in found:
+                results.append(None)
+                continue
+            records = loads(found[entry_key])
+            if not compact_results:
+                records = [batch.expand(record, lang) for record in records]
+            results.append(cls.ParseResult(records))
+        return results
+
+    def put_many(self, texts, results, lang=const.LANG, has_value=True):
+        """
+        Store the results of many documents in one transaction, skipping
+        truncated ones, and evict the least recently used entries beyond
+        max_bytes.
+        :param results: lists of Quantity or CompactQuantity objects
+        """
+        now = time.time()
+        rows = []
+        for text, result in zip(texts, results):
+            if getattr(result, "truncated", False):
+                continue
+            data = dumps(result)
+            rows.append(
+                (key(text, lang, has_value), load.data_version(lang), data, len(data), now)
+            )
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._evict(connection, lang)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _evict(self, connection, lang=const.LANG):
+        """
+        Delete entries of other data versions, then the least recently used
+        ones, until the stored results fit into max_bytes.
+        """
+        size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        current = [load.data_version(lang)]
+        cursor = connection.execute(
+            "SELECT key, size FROM results ORDER BY version = ?, accessed", current
+        )
+        evicted = []
+        for entry_key, entry_size in cursor:
+            if size <= self.max_bytes:
+                break
+            evicted.append((entry_key,))
+            size -= entry_size
+        cursor.close()
+        connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    ###########################################################################
+    def parse(self, text, lang=const.LANG, has_value=True, deadline=None):
+        """
+        Extract all quantities from unstructured text, reading and storing
+        them in the cache. See parser.parse.
+        """
+        result = self.get_many([text], lang, has_value)[0]
+        if result is None:
+            result = parser.parse(text, lang, has_value, deadline)
+            self.put_many([text], [result], lang, has_value)
+        return result
+
+    def parse_many(self, texts, lang=const.LANG, has_value=True, **kwargs):
+        """
+        Extract all quantities from many texts, parsing only those that are
+        not cached with batch.parse_many and its options, any backend.
+        :param lang: language of all texts
+        """
+        texts = list(texts)
+        compact_results = kwargs.get("compact_results", False)
+        results = self.get_many(texts, lang, has_value, compact_results)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            parsed = batch.parse_many(
+                [texts[index] for index in missing], lang, has_value, **kwargs
+            )
+            self.put_many([texts[index] for index in missing], parsed, lang, has_value)
+            for index, result in zip(missing, parsed):
+                results[index] = result
+        return results
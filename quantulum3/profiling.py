@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` opt-in timing of the parse stages.
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Callbacks receiving (stage, seconds, self_seconds) after each stage, a tuple
+# that is replaced on change so that readers need no lock
+_HOOKS = ()
+_HOOKS_LOCK = threading.Lock()
+# Per thread stack of the time spent in nested stages
+_LOCAL = threading.local()
+
+
+###############################################################################
+def add_hook(callback):
+    """
+    Call callback(stage, seconds, self_seconds) after every parse stage.
+    self_seconds excludes the time spent in nested stages.
+    """
+    global _HOOKS
+    with _HOOKS_LOCK:
+        _HOOKS = _HOOKS + (callback,)
+
+
+def remove_hook(callback):
+    global _HOOKS
+    with _HOOKS_LOCK:
+        hooks = list(_HOOKS)
+        hooks.remove(callback)
+        _HOOKS = tuple(hooks)
+
+
+def enabled():
+    return bool(_HOOKS)
+
+
+@contextmanager
+def timed(name):
+    """
+    Time a block as stage name, if any hook is installed.
+    """
+    hooks = _HOOKS
+    if not hooks:
+        yield
+        return
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += seconds
+        for hook in hooks:
+            hook(name, seconds, seconds - nested)
+
+
+def stage(name):
+    """
+    Decorator timing every call of a function as stage name. Without hooks
+    it only adds a function call.
+    """
+
+    def decorator(funct):
+        @functools.wraps(funct)
+        def staged_function(*args, **kwargs):
+            if not _HOOKS:
+                return funct(*args, **kwargs)
+            with timed(name):
+                return funct(*args, **kwargs)
+
+        return staged_function
+
+    return decorator
+
+
+def iterate(name, iterable):
+    """
+    Time every step of an iterable as stage name, if any hook is installed.
+    """
+    if not _HOOKS:
+        return iterable
+    return _timed_iterator(name, iter(iterable))
+
+
+def _timed_iterator(name, iterator):
+    while True:
+        with timed(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+###############################################################################
+class Profile(object):
+    """
+    Aggregated calls, wall time and self time per stage, collected from all
+    threads while used as a context manager or hook.
+
+        with profiling.Profile() as profile:
+            parser.parse(text)
+        print(profile.report())
+    """
+
+    def __init__(self):
+
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, seconds, self_seconds):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += self_seconds
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+
+    def __getstate__(self):
+        return {"stages": self.as_dict()}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.merge(state["stages"])
+
+    def as_dict(self):
+        """
+        {stage: {"calls": ..., "seconds": ..., "self_seconds": ...}}
+        """
+        with self._lock:
+            return {
+                name: {"calls": calls, "seconds": seconds, "self_seconds": self_seconds}
+                for name, (calls, seconds, self_seconds) in self.stages.items()
+            }
+
+    def merge(self, other):
+        """
+        Add the stages of another Profile or of an as_dict() snapshot.
+        """
+        if isinstance(other, Profile):
+            other = other.as_dict()
+        with self._lock:
+            for name, values in other.items():
+                entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += values["calls"]
+                entry[1] += values["seconds"]
+                entry[2] += values["self_seconds"]
+        return self
+
+    def report(self):
+        """
+        Table of the stages, sorted by self time.
+        """
+        stages = self.as_dict()
+        total = sum(values["self_seconds"] for values in stages.values()) or 1.0
+        lines = [
+            "%-26s %10s %12s %12s %7s"
+            % ("stage", "calls", "total (s)", "self (s)", "self %")
+        ]
+        for name, values in sorted(
+            stages.items(), key=lambda item: -item[1]["self_seconds"]
+        ):
+            lines.append(
+                "%-26s %10d %12.4f %12.4f %6.1f%%"
+                % (
+                    name,
+                    values["calls"],
+                    values["seconds"],
+                    values["self_seconds"],
+                    100 * values["self_seconds"] / total,
+                )
+            )
+        return "\n".join(lines)
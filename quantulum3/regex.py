@@ -61,9 +61,10 @@ def uncertainties(lang=const.LANG):
 
 
 ###############################################################################
+@load.cached
 def number_words(lang=const.LANG):
     """
-    Convert number words to integers in a given text.
+    Map of number words to (scale, increment), shared, do not modify.
     """
 
     numwords = {}
@@ -88,6 +89,7 @@ def number_words(lang=const.LANG):
     return numwords
 
 
+@load.cached
 def numberwords_regex(lang=const.LANG):
     all_numbers = r"|".join(
         r"((?<=\W)|^)%s((?=\W)|$)" % i for i in list(number_words(lang).keys()) if i
@@ -189,17 +191,22 @@ def operators(lang=const.LANG):
     return ops
 
 
+# Runs of digits, all of them or all but the last one, which may then be the
+# base or the exponent of a decimal exponent. Other splits of a run leave a
+# digit next and cannot match, but made the number pattern cubic in its length
+DIGITS = r"(?:(?>\d+)|\d(?>\d*(?=\d)))"
+
 # Pattern for extracting a digit-based number
 NUM_PATTERN = r"""
     (?{number}              # required number
         [+-]?                  #   optional sign
-        (\.?\d+|[{unicode_fract}])     #   required digits or unicode fraction
+        (\.?{digits}|[{unicode_fract}])     #   required digits or unicode fraction
         (?:[{grouping}]\d{{3}})*         #   allowed grouping
-        (?{decimals}[{decimal_operators}]\d+)?    #   optional decimals
+        (?{decimals}[{decimal_operators}]{digits})?    #   optional decimals
     )
     (?{scale}               # optional exponent
         (?:{multipliers})?                #   multiplicative operators
-        (?{base}(E|e|\d+)\^?)    #   required exponent prefix
+        (?{base}(E|e|{digits})\^?)    #   required exponent prefix
         (?{exponent}[+-]?\d+|[{superscript}]) # required exponent, superscript
                                               # or normal
     )?
@@ -228,6 +235,7 @@ def number_pattern_no_groups(lang=const.LANG):
         superscript=unicode_superscript_regex(),
         unicode_fract=unicode_fractions_regex(),
         decimal_operators=decimal_operators_regex(lang),
+        digits=DIGITS,
     )
 
 
@@ -244,6 +252,7 @@ def number_pattern_groups(lang=const.LANG):
         superscript=unicode_superscript_regex(),
         unicode_fract=unicode_fractions_regex(),
         decimal_operators=decimal_operators_regex(lang),
+        digits=DIGITS,
     )
 
 
@@ -267,6 +276,7 @@ def range_pattern(lang=const.LANG):
     )
 
 
+@load.cached
 def text_pattern_reg(lang=const.LANG):
     txt_pattern = _get_regex(lang).TEXT_PATTERN.format(
         number_pattern_no_groups=number_pattern_no_groups(lang),
@@ -278,6 +288,24 @@ def text_pattern_reg(lang=const.LANG):
 
 ###############################################################################
 def units_regex(lang=const.LANG, has_value=True):
+    """
+    Cached version of build_units_regex, shared by all parses of a language
+    and registry.
+    """
+    return _units_regex(lang, has_value)
+
+
+def _layer_units_regex(registry, base, lang=const.LANG, has_value=True):
+    # Registries without custom units share the patterns of the process
+    return build_units_regex(lang, has_value) if registry.units else base
+
+
+@load.scoped(_layer_units_regex)
+def _units_regex(lang=const.LANG, has_value=True):
+    return build_units_regex(lang, has_value)
+
+
+def build_units_regex(lang=const.LANG, has_value=True):
     """
     Build a compiled regex object. Groups of the extracted items, with 4
     repetitions, are:
@@ -341,9 +369,9 @@ def units_regex(lang=const.LANG, has_value=True):
     else:
         pattern = r"""
                     (?P<scale>               # optional exponent
-                        (?:P<multipliers>)?                #   multiplicative operators
+                        (?:%s)?                #   multiplicative operators
                         (?P<base>(E|e|\d+)\^?)    #   required exponent prefix
-                        (?P<exponent>[+-]?\d+|[P<superscript>]) # required exponent, superscript
+                        (?P<exponent>[+-]?\d+|[%s]) # required exponent, superscript
                                                               # or normal
                     )?
                     (?<!\w)                                     # "begin" of word
@@ -354,7 +382,7 @@ def units_regex(lang=const.LANG, has_value=True):
                     (?:(?P<operator4>%s(?=(%s)%s))?(?P<unit4>(?:%s)%s)?)    # Operator + Unit (4)
                     (?!\w)                                      # "end" of word
                 """ % tuple(
-            [all_symbols]
+            [multiplication_operators_regex(lang), unicode_superscript_regex(), all_symbols]
             + 4 * [all_ops, all_units, exponent, all_units, exponent]
         )
     regex = re.compile(pattern, re.VERBOSE | re.IGNORECASE)
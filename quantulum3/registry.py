@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` unit registries, custom units and entities per tenant.
+"""
+
+import contextlib
+from collections import defaultdict
+
+from . import load
+
+
+###############################################################################
+class Registry(object):
+    """
+    Custom units and entities of one tenant, layered over the units and
+    entities of the process, custom ones included. A registry holds only its
+    own entries and the unit patterns compiled for them, the base tables are
+    shared. Units of the base keep their entities even if a registry replaces
+    one of them.
+
+        >>> registry = Registry()
+        >>> registry.add_unit("sku", surfaces=["sku", "skus"], entity="dimensionless")
+        >>> parser.parse("12 skus", registry=registry)
+    """
+
+    def __init__(self, units=None, entities=None):
+        """
+        :param units: dict of unit name to properties as in units.json
+        :param entities: dict of entity name to properties as in entities.json
+        """
+        self.units = defaultdict(dict)
+        self.entities = defaultdict(dict)
+        for name, props in (units or {}).items():
+            self.units[name].update(props)
+        for name, props in (entities or {}).items():
+            self.entities[name].update(props)
+        # Data built for this registry, see load.scoped
+        self.cache = {}
+        self.epoch = None
+
+    def __repr__(self):
+
+        msg = "Registry(units=%d, entities=%d)"
+        msg = msg % (len(self.units), len(self.entities))
+        return msg
+
+    def add_unit(self, name, **kwargs):
+        """
+        Adds a custom unit, see load.add_custom_unit.
+        """
+        self.units[name].update(kwargs)
+        self.cache = {}
+
+    def remove_unit(self, name):
+        """
+        Removes a custom unit of this registry.
+        """
+        self.units.pop(name)
+        self.cache = {}
+
+    def add_entity(self, name, **kwargs):
+        """
+        Adds a custom entity, see load.add_custom_entity.
+        """
+        self.entities[name].update(kwargs)
+        self.cache = {}
+
+    def remove_entity(self, name):
+        """
+        Removes a custom entity of this registry.
+        """
+        self.entities.pop(name)
+        self.cache = {}
+
+    @contextlib.contextmanager
+    def active(self):
+        """
+        Context in which units, entities and unit patterns are those of this
+        registry, e.g. for parser.iter_parse. Contexts are per thread.
+        """
+        token = load.REGISTRY.set(self)
+        try:
+            yield self
+        finally:
+            load.REGISTRY.reset(token)
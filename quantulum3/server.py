@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` HTTP server, parsing concurrent requests in micro-batches.
+
+    python -m quantulum3.server --port 8000 --workers 4
+
+POST /parse    {"text": "..."} or {"texts": ["...", ...]}, optional "lang",
+               "has_value", "timeout" in seconds and "normalize_si"
+GET  /health   readiness of the server
+GET  /metrics  counters and latencies in the Prometheus text format
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import batch, const, metrics, parser, slowlog
+
+# Documents parsed together at most, and seconds to wait for more documents
+# once the first one arrived
+MAX_BATCH = 64
+MAX_WAIT = 0.005
+# Default time budget of a request in seconds
+TIMEOUT = 10.0
+# Documents waiting to be parsed before new requests are rejected
+MAX_QUEUE = 10000
+# Largest accepted request body in bytes
+MAX_BODY = 16 << 20
+# Seconds granted on top of the deadline for moving results between processes
+GRACE = 1.0
+# Paths with their own label value in the request metrics
+PATHS = ("/parse", "/health", "/metrics")
+
+REQUESTS = metrics.REGISTRY.counter(
+    "quantulum3_server_requests_total", "Requests by path and HTTP status code.",
+    ("path", "code"),
+)
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "quantulum3_server_request_seconds", "Request latency.", ("path",)
+)
+BATCHES = metrics.REGISTRY.counter(
+    "quantulum3_server_batches_total", "Parsed micro-batches."
+)
+BATCHED_DOCUMENTS = metrics.REGISTRY.counter(
+    "quantulum3_server_batched_documents_total", "Documents in parsed micro-batches."
+)
+EXPIRED = metrics.REGISTRY.counter(
+    "quantulum3_server_expired_total", "Documents whose deadline passed while queued."
+)
+QUEUE_SIZE = metrics.REGISTRY.gauge(
+    "quantulum3_server_queue_size", "Documents waiting to be parsed."
+)
+UPTIME = metrics.REGISTRY.gauge("quantulum3_server_uptime_seconds", "Seconds since start.")
+
+
+###############################################################################
+def _parse_items(items, drain=False, slow_log=None):
+    """
+    Parse (text, lang, has_value, deadline) items, in a worker process.
+    time.monotonic() is system-wide, so deadlines hold across processes.
+    :param drain: also return the metrics recorded meanwhile, for the parent
+    :param slow_log: optional slowlog.SlowLog capturing slow documents
+    :return: (compact results, drained metrics or None)
+    """
+    parse = parser.parse if slow_log is None else slow_log.parse
+    results = []
+    for text, lang, has_value, deadline in items:
+        start = time.monotonic()
+        result = parse(text, lang, has_value, deadline)
+        result.seconds = time.monotonic() - start
+        results.append(batch._compact_result(result))
+    return results, metrics.REGISTRY.drain() if drain else None
+
+
+class MicroBatcher(object):
+    """
+    Collect documents submitted by concurrent requests into batches of up to
+    max_batch documents, waiting at most max_wait seconds for a batch to fill
+    up, and parse each batch at once in a process pool, or in the batching
+    thread without workers.
+    """
+
+    def __init__(
+        self,
+        workers=0,
+        max_batch=MAX_BATCH,
+        max_wait=MAX_WAIT,
+        max_queue=MAX_QUEUE,
+        langs=None,
+        slow_log=None,
+    ):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.langs = langs or [const.LANG]
+        self.slow_log = slow_log
+        self._queue = queue.Queue()
+        # Batches handed to workers and not done yet
+        self._slots = threading.BoundedSemaphore(max(1, 2 * workers))
+        self._executor = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        for lang in self.langs:
+            batch.warmup(lang, True)
+            batch.warmup(lang, False)
+        if self.workers:
+            self._executor = self._new_executor()
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    def queue_size(self):
+        return self._queue.qsize()
+
+    def submit(self, text, lang=const.LANG, has_value=True, deadline=None):
+        """
+        Queue a document for parsing.
+        :param deadline: time.monotonic() value, the document is parsed with
+                         the time left and dropped if none is left
+        :return: concurrent.futures.Future of its CompactQuantity ParseResult
+        """
+        if self._queue.qsize() >= self.max_queue:
+            raise OverflowError("Too many documents waiting")
+        future = Future()
+        self._queue.put((future, text, lang, has_value, deadline))
+        return future
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=batch._init_worker,
+            initargs=(self.langs, True),
+        )
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            end = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, end - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                items.append(item)
+            self._dispatch(items)
+
+    def _dispatch(self, items):
+        now = time.monotonic()
+        futures, work = [], []
+        for future, text, lang, has_value, deadline in items:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if deadline is not None and deadline <= now:
+                EXPIRED.inc()
+                future.set_exception(TimeoutError("Deadline passed while queued"))
+                continue
+            futures.append(future)
+            work.append((text, lang, has_value, deadline))
+        if not work:
+            return
+        BATCHES.inc()
+        BATCHED_DOCUMENTS.inc(len(work))
+
+        if self._executor is None:
+            self._deliver(futures, work, _parse_items, work, False, self.slow_log)
+            return
+        # Spread the batch over the workers
+        size = -(-len(work) // self.workers)
+        for start in range(0, len(work), size):
+            self._submit(futures[start:start + size], work[start:start + size])
+
+    def _submit(self, futures, work):
+        self._slots.acquire()
+        try:
+            pending = self._executor.submit(_parse_items, work, True, self.slow_log)
+        except BrokenProcessPool:
+            self._executor = self._new_executor()
+            pending = self._executor.submit(_parse_items, work, True, self.slow_log)
+        pending.add_done_callback(
+            lambda done: self._deliver(futures, work, done.result)
+        )
+
+    def _deliver(self, futures, work, function, *args):
+        """
+        Set the results of function(*args) or its exception on the futures.
+        """
+        try:
+            results, drained = function(*args)
+        except BaseException as err:
+            for future in futures:
+                future.set_exception(err)
+        else:
+            if drained:
+                metrics.REGISTRY.merge(drained)
+            for future, result, item in zip(futures, results, work):
+                metrics.record_document(result, item[1])
+                future.set_result(result)
+        finally:
+            if self._executor is not None:
+                self._slots.release()
+
+
+###############################################################################
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the endpoints, the server has batcher, started and
+    request_timeout attributes.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body, content_type="application/json"):
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        start = time.monotonic()
+        if self.path == "/health":
+            code = 200
+            self._send(code, {"status": "ok", "workers": self.server.batcher.workers})
+        elif self.path == "/metrics":
+            code = 200
+            QUEUE_SIZE.set(self.server.batcher.queue_size())
+            UPTIME.set(time.time() - self.server.started)
+            self._send(code, metrics.REGISTRY.prometheus(), "text/plain; version=0.0.4")
+        else:
+            code = 404
+            self._send(code, {"error": "Not found"})
+        self._record(code, start)
+
+    def do_POST(self):
+        start = time.monotonic()
+        code, body = self._parse(start)
+        self._send(code, body)
+        self._record(code, start)
+
+    def _record(self, code, start):
+        path = self.path if self.path in PATHS else "other"
+        REQUESTS.inc(1, (path, code))
+        REQUEST_SECONDS.observe(time.monotonic() - start, (path,))
+
+    def _parse(self, start):
+        """
+        :return: (status code, response)
+        """
+        if self.path != "/parse":
+            return 404, {"error": "Not found"}
+        # Bodies without a valid length cannot be skipped to the next request
+        if self.headers.get("Content-Length") is None:
+            self.close_connection = True
+            return 411, {"error": "Content-Length required"}
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                raise ValueError("negative Content-Length %d" % length)
+        except ValueError as err:
+            self.close_connection = True
+            return 400, {"error": "%s: %s" % (type(err).__name__, err)}
+        if length > MAX_BODY:
+            self.close_connection = True
+            return 413, {"error": "Body larger than %d bytes" % MAX_BODY}
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            single = "text" in request
+            texts = [request["text"]] if single else list(request["texts"])
+            if not all(isinstance(text, str) for text in texts):
+                raise TypeError("texts have to be strings")
+            lang = request.get("lang", const.LANG)
+            if lang not in self.server.batcher.langs:
+                raise ValueError("Language %s is not loaded" % lang)
+            has_value = bool(request.get("has_value", True))
+            timeout = float(request.get("timeout", self.server.request_timeout))
+            normalize_si = bool(request.get("normalize_si", False))
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            return 400, {"error": "%s: %s" % (type(err).__name__, err)}
+
+        deadline = start + timeout
+        try:
+            futures = [
+                self.server.batcher.submit(text, lang, has_value, deadline)
+                for text in texts
+            ]
+        except OverflowError as err:
+            return 503, {"error": str(err)}
+        try:
+            results = [
+                future.result(max(0.0, deadline + GRACE - time.monotonic()))
+                for future in futures
+            ]
+        except (FutureTimeoutError, TimeoutError):
+            for future in futures:
+                future.cancel()
+            return 504, {"error": "Deadline of %g s exceeded" % timeout}
+        except Exception as err:  # e.g. a crashed worker process
+            return 500, {"error": "%s: %s" % (type(err).__name__, err)}
+
+        conversions = {}
+        documents = [
+            {
+                "quantities": [
+                    batch.quantity_record(record, lang, normalize_si, conversions)
+                    for record in result
+                ],
+                "truncated": result.truncated,
+            }
+            for result in results
+        ]
+        return 200, documents[0] if single else {"results": documents}
+
+
+def make_server(host="127.0.0.1", port=8000, batcher=None, timeout=TIMEOUT):
+    """
+    Create a server, start the batcher before serving.
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.batcher = batcher or MicroBatcher()
+    server.started = time.time()
+    server.request_timeout = timeout
+    return server
+
+
+###############################################################################
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Serve quantity extraction over HTTP"
+    )
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument(
+        "--workers", type=int, default=0,
+        help="worker processes, 0 parses in the batching thread",
+    )
+    arg_parser.add_argument("--lang", action="append", default=None)
+    arg_parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    arg_parser.add_argument(
+        "--max-wait-ms", type=float, default=MAX_WAIT * 1000,
+        help="time to wait for a batch to fill up",
+    )
+    arg_parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    arg_parser.add_argument(
+        "--timeout", type=float, default=TIMEOUT, help="default request deadline in seconds"
+    )
+    arg_parser.add_argument(
+        "--slow-log", default=None, help="JSONL file capturing slow documents"
+    )
+    arg_parser.add_argument(
+        "--slow-threshold", type=float, default=slowlog.THRESHOLD,
+        help="parse time in seconds from which documents are captured",
+    )
+    args = arg_parser.parse_args(argv)
+
+    batcher = MicroBatcher(
+        args.workers, args.max_batch, args.max_wait_ms / 1000, args.max_queue, args.lang,
+        slowlog.SlowLog(args.slow_log, args.slow_threshold) if args.slow_log else None,
+    )
+    batcher.start()
+    server = make_server(args.host, args.port, batcher, args.timeout)
+    print("Serving on http://%s:%d" % server.server_address[:2], flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
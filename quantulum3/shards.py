@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` sharded extraction jobs with checkpoints and claims.
+
+    python -m quantulum3.shards manifest.txt --output-dir out --workers 8
+
+The manifest lists one input file per line, read like the inputs of
+python -m quantulum3. Every node of a job runs the same command; nodes
+coordinate through claim files in a shared directory, created atomically, so
+each shard is processed once. Each shard gets an output and a stats file, and
+finished shards are appended to a checkpoint file, so a restarted job skips
+them.
+"""
+
+import argparse
+import glob
+import json
+import os
+import socket
+import sys
+import time
+
+from . import batch, const, jsonl, metrics
+
+# Seconds without a heartbeat after which the claim of another node is stale
+CLAIM_TIMEOUT = 3600.0
+
+
+###############################################################################
+def read_manifest(path):
+    """
+    Input files of a manifest, relative paths are relative to the manifest.
+    Empty lines and lines starting with # are skipped.
+    :return: list of (name, path), names are unique within the manifest
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    shards = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name = os.path.basename(line)
+            for suffix in (".gz", ".jsonl", ".txt"):
+                if name.endswith(suffix):
+                    name = name[: -len(suffix)]
+            shards.append(
+                ("%05d-%s" % (len(shards), name), os.path.join(directory, line))
+            )
+    return shards
+
+
+def _write_atomic(path, text):
+    """
+    Write a file at once, readers never see a partial file.
+    """
+    tmp = "%s.%s-%d.tmp" % (path, socket.gethostname(), os.getpid())
+    with open(tmp, "w", encoding="utf-8") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+###############################################################################
+class Checkpoint(object):
+    """
+    Append-only file recording the finished shards, one JSON line each.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        self.done.add(json.loads(line)["shard"])
+                    except (ValueError, KeyError):
+                        # Line cut short by a crash
+                        continue
+
+    def __contains__(self, name):
+        return name in self.done
+
+    def add(self, name, stats):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(dict(stats, shard=name)) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.done.add(name)
+
+
+class Claims(object):
+    """
+    Claims of shards in a directory shared by all nodes. A claim is a file
+    created with O_CREAT | O_EXCL, which succeeds for exactly one node. Claims
+    of dead processes on this node, and claims without a heartbeat for
+    timeout seconds, are stale and taken over.
+    """
+
+    def __init__(self, directory, timeout=CLAIM_TIMEOUT):
+
+        self.directory = directory
+        self.timeout = timeout
+        self.owner = {"host": socket.gethostname(), "pid": os.getpid()}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + ".claim")
+
+    def claim(self, name):
+        """
+        :return: whether this process owns the claim of the shard now
+        """
+        path = self._path(name)
+        for _ in range(2):
+            try:
+                descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._take_over(path):
+                    return False
+                continue
+            with os.fdopen(descriptor, "w") as file:
+                json.dump(dict(self.owner, claimed=time.time()), file)
+            return True
+        return False
+
+    def refresh(self, name):
+        """
+        Heartbeat of a claim that is being processed.
+        """
+        os.utime(self._path(name))
+
+    def release(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def _stale(self, path):
+        """
+        :return: the content of a stale claim, None if the claim is alive
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                content = file.read()
+            modified = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return ""
+        try:
+            owner = json.loads(content)
+        except ValueError:
+            # Claim being written right now, or by a crashed process
+            owner = {}
+        if owner.get("host") == self.owner["host"] and owner.get("pid"):
+            try:
+                os.kill(owner["pid"], 0)
+            except ProcessLookupError:
+                return content
+            except PermissionError:
+                pass
+        if time.time() - modified > self.timeout:
+            return content
+        return None
+
+    def _take_over(self, path):
+        """
+        Remove a stale claim, only one node succeeds in moving it away.
+        :return: whether the claim was removed
+        """
+        content = self._stale(path)
+        if content is None:
+            return False
+        moved = "%s.%s-%d.stale" % (path, self.owner["host"], self.owner["pid"])
+        try:
+            os.rename(path, moved)
+        except FileNotFoundError:
+            return True
+        with open(moved, "r", encoding="utf-8") as file:
+            if file.read() != content:
+                # Another node took over in between, restore its claim
+                try:
+                    os.link(moved, path)
+                except FileExistsError:
+                    pass
+                os.remove(moved)
+                return False
+        os.remove(moved)
+        return True
+
+
+###############################################################################
+def output_path(output_dir, name, compress=True):
+    return os.path.join(output_dir, name + (".jsonl.gz" if compress else ".jsonl"))
+
+
+def stats_path(output_dir, name):
+    return os.path.join(output_dir, name + ".stats.json")
+
+
+def process_shard(
+    name,
+    path,
+    output_dir,
+    claims=None,
+    jsonl_input=False,
+    field="text",
+    compress=True,
+    **kwargs
+):
+    """
+    Extract the quantities of one shard into its output and stats files,
+    both written atomically, the stats file last.
+    :param kwargs: options of jsonl.extract and batch.parse_many
+    :return: the statistics of the shard
+    """
+    final = output_path(output_dir, name, compress)
+    base, suffix = (final[:-3], ".gz") if compress else (final, "")
+    tmp = "%s.%s-%d.tmp%s" % (base, socket.gethostname(), os.getpid(), suffix)
+    # Partial output of earlier attempts that crashed
+    for leftover in glob.glob(glob.escape(base) + ".*.tmp" + suffix):
+        os.remove(leftover)
+    stats = batch.BatchStats()
+    latencies = metrics.LatencyHistogram()
+    started = time.time()
+    start = time.perf_counter()
+    callback = (lambda: claims.refresh(name)) if claims is not None else None
+    try:
+        with jsonl.open_file(tmp, "w") as output:
+            errors = jsonl.extract(
+                jsonl.read_documents([path], jsonl_input, field),
+                output,
+                field=field,
+                stats=stats,
+                latencies=latencies,
+                callback=callback,
+                **kwargs
+            )
+        os.replace(tmp, final)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    seconds = time.perf_counter() - start
+
+    shard_stats = {
+        "shard": name,
+        "input": path,
+        "output": final,
+        "host": socket.gethostname(),
+        "started": started,
+        "seconds": seconds,
+        "documents": stats.documents,
+        "characters": stats.characters,
+        "quantities": stats.quantities,
+        "invalid": errors,
+        "timeouts": stats.timeouts,
+        "failed": stats.failed,
+        "latency_p50": latencies.percentile(0.5),
+        "latency_p99": latencies.percentile(0.99),
+        "latency_max": latencies.max,
+    }
+    _write_atomic(stats_path(output_dir, name), json.dumps(shard_stats, indent=2) + "\n")
+    return shard_stats
+
+
+def run(
+    manifest,
+    output_dir,
+    claims_dir=None,
+    checkpoint=None,
+    claim_timeout=CLAIM_TIMEOUT,
+    log=None,
+    **kwargs
+):
+    """
+    Process all shards of a manifest that are neither finished nor claimed
+    by another node.
+    :param claims_dir: directory shared by all nodes, defaults to
+                       output_dir/claims
+    :param checkpoint: checkpoint file of this node, defaults to
+                       output_dir/checkpoint-<host>.jsonl
+    :param log: optional text file receiving a line per shard
+    :param kwargs: options of process_shard
+    :return: list with the statistics of the shards processed by this call
+    """
+    if kwargs.get("backend") == "process" and kwargs.get("pool") is None:
+        # One set of workers for all shards
+        lang = kwargs.get("lang", const.LANG)
+        langs = [lang] if isinstance(lang, str) else lang
+        with batch.ProcessPool(
+            kwargs.pop("workers", None), langs, kwargs.get("has_value", True)
+        ) as pool:
+            return run(
+                manifest, output_dir, claims_dir, checkpoint, claim_timeout, log,
+                pool=pool, **kwargs
+            )
+    os.makedirs(output_dir, exist_ok=True)
+    claims = Claims(claims_dir or os.path.join(output_dir, "claims"), claim_timeout)
+    checkpoint = Checkpoint(
+        checkpoint
+        or os.path.join(output_dir, "checkpoint-%s.jsonl" % socket.gethostname())
+    )
+    processed = []
+    for name, path in read_manifest(manifest):
+        if name in checkpoint or os.path.exists(stats_path(output_dir, name)):
+            continue
+        if not claims.claim(name):
+            continue
+        try:
+            # Finished by another node between the check and the claim
+            if os.path.exists(stats_path(output_dir, name)):
+                continue
+            shard_stats = process_shard(name, path, output_dir, claims, **kwargs)
+            checkpoint.add(name, shard_stats)
+        finally:
+            claims.release(name)
+        processed.append(shard_stats)
+        if log is not None:
+            print(
+                "%s: %d documents, %d quantities in %.2f s"
+                % (name, shard_stats["documents"], shard_stats["quantities"],
+                   shard_stats["seconds"]),
+                file=log,
+                flush=True,
+            )
+    return processed
+
+
+###############################################################################
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m quantulum3.shards",
+        description="Extract quantities from the shards of a manifest",
+    )
+    arg_parser.add_argument("manifest", help="file listing one input file per line")
+    arg_parser.add_argument("--output-dir", required=True)
+    arg_parser.add_argument(
+        "--claims-dir", default=None, help="directory shared by all nodes"
+    )
+    arg_parser.add_argument(
+        "--checkpoint", default=None, help="checkpoint file of this node"
+    )
+    arg_parser.add_argument(
+        "--claim-timeout", type=float, default=CLAIM_TIMEOUT,
+        help="seconds after which claims without heartbeat are taken over",
+    )
+    arg_parser.add_argument(
+        "--compress", action=argparse.BooleanOptionalAction, default=True,
+        help="gzip the output files",
+    )
+    arg_parser.add_argument("--jsonl", action="store_true")
+    arg_parser.add_argument("--field", default="text")
+    arg_parser.add_argument("--lang", default=const.LANG)
+    arg_parser.add_argument(
+        "--has-value", action=argparse.BooleanOptionalAction, default=True
+    )
+    arg_parser.add_argument("--workers", type=int, default=1)
+    arg_parser.add_argument("--backend", choices=batch.BACKENDS, default=None)
+    arg_parser.add_argument("--chunk-size", type=int, default=None)
+    arg_parser.add_argument("--batch-size", type=int, default=jsonl.BATCH_SIZE)
+    arg_parser.add_argument("--timeout", type=float, default=None)
+    arg_parser.add_argument("--normalize-si", action="store_true")
+    args = arg_parser.parse_args(argv)
+
+    start = time.perf_counter()
+    processed = run(
+        args.manifest,
+        args.output_dir,
+        claims_dir=args.claims_dir,
+        checkpoint=args.checkpoint,
+        claim_timeout=args.claim_timeout,
+        log=sys.stderr,
+        jsonl_input=args.jsonl,
+        field=args.field,
+        compress=args.compress,
+        lang=args.lang,
+        has_value=args.has_value,
+        normalize_si=args.normalize_si,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        backend=args.backend or ("process" if args.workers > 1 else "serial"),
+        chunk_size=args.chunk_size,
+        timeout=args.timeout,
+    )
+    seconds = time.perf_counter() - start
+    documents = sum(shard["documents"] for shard in processed)
+    print(
+        "%d shards, %d documents in %.2f s (%.1f docs/s)"
+        % (len(processed), documents, seconds, documents / seconds if seconds else 0.0),
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
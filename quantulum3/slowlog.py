@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` capture of slow documents, and their replay under the
+profiler.
+
+    python -m quantulum3 --slow-log slow.jsonl --slow-threshold 0.05 docs.txt
+    python -m quantulum3.slowlog slow.jsonl slow.jsonl.1 --repeat 5
+
+Each captured document is a JSON line with its text, language, flags, parse
+time and the time spent in each parse stage.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+
+from . import const, parser, profiling
+
+# Parse time in seconds from which documents are captured
+THRESHOLD = 0.1
+# Size of the log in bytes before it is rotated
+MAX_BYTES = 64 << 20
+
+
+###############################################################################
+class SlowLog(object):
+    """
+    Bounded JSONL log of the documents parsed slower than threshold seconds.
+    Stages are only timed while a document is parsed through the log. Once
+    the log exceeds max_bytes it is moved to path.1, replacing the previous
+    one, so at most about twice max_bytes are kept. Processes sharing a log
+    append whole lines; picklable for worker processes.
+    """
+
+    def __init__(self, path, threshold=THRESHOLD, max_bytes=MAX_BYTES):
+
+        self.path = path
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.captured = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Documents being parsed, the hook is installed while there are any
+        self._active = 0
+
+    def __getstate__(self):
+        return {
+            "path": self.path,
+            "threshold": self.threshold,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return "SlowLog(%r, threshold=%g, captured=%d)" % (
+            self.path,
+            self.threshold,
+            self.captured,
+        )
+
+    def __call__(self, name, seconds, self_seconds):
+        stages = getattr(self._local, "stages", None)
+        if stages is None:
+            # Stage of a thread that is not parsing through this log
+            return
+        entry = stages.get(name)
+        if entry is None:
+            entry = stages[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += self_seconds
+
+    def _enter(self):
+        with self._lock:
+            if not self._active:
+                profiling.add_hook(self)
+            self._active += 1
+
+    def _exit(self):
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                profiling.remove_hook(self)
+
+    def parse(self, text, lang=const.LANG, has_value=True, deadline=None, cache=None):
+        """
+        parser.parse, capturing the document if it is slow.
+        """
+        self._local.stages = {}
+        self._enter()
+        start = time.monotonic()
+        try:
+            result = parser.parse(text, lang, has_value, deadline, cache)
+        finally:
+            seconds = time.monotonic() - start
+            self._exit()
+            stages, self._local.stages = self._local.stages, None
+        if seconds >= self.threshold:
+            self.write(
+                {
+                    "time": time.time(),
+                    "seconds": seconds,
+                    "lang": lang,
+                    "has_value": has_value,
+                    "deadline": deadline is not None,
+                    "truncated": result.truncated,
+                    "cached": cache is not None,
+                    "characters": len(text),
+                    "quantities": len(result),
+                    "stages": {
+                        name: {"calls": calls, "seconds": total, "self_seconds": own}
+                        for name, (calls, total, own) in stages.items()
+                    },
+                    "text": text,
+                }
+            )
+        return result
+
+    def write(self, entry):
+        """
+        Append an entry, rotating the log when it is full.
+        """
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(line) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            # A single write in append mode keeps lines of processes apart
+            descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(descriptor, line)
+            finally:
+                os.close(descriptor)
+            self.captured += 1
+
+
+###############################################################################
+def read_entries(paths):
+    """
+    Captured documents of slow logs, skipping lines cut short by a crash.
+    """
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("text"), str):
+                    yield entry
+
+
+def replay(entries, repeat=3, profile=None):
+    """
+    Parse captured documents again.
+    :param repeat: parses per document, the best time is reported
+    :param profile: optional profiling.Profile receiving all stage timings
+    :return: list of (entry, best replay time in seconds, quantities)
+    """
+    results = []
+    for entry in entries:
+        lang = entry.get("lang", const.LANG)
+        has_value = entry.get("has_value", True)
+        # Load the data outside of the timings
+        parser.parse("", lang, has_value)
+        best = None
+        for _ in range(repeat):
+            with profile if profile is not None else contextlib.nullcontext():
+                start = time.perf_counter()
+                quantities = parser.parse(entry["text"], lang, has_value)
+                seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        results.append((entry, best, len(quantities)))
+    return results
+
+
+###############################################################################
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m quantulum3.slowlog",
+        description="Replay documents captured by a slow log under the profiler",
+    )
+    arg_parser.add_argument("logs", nargs="+", help="slow log files")
+    arg_parser.add_argument(
+        "--repeat", type=int, default=3, help="parses per document, the best counts"
+    )
+    arg_parser.add_argument(
+        "--top", type=int, default=20, help="slowest documents to list"
+    )
+    arg_parser.add_argument(
+        "--json", default=None, help="also write the replay times to this file"
+    )
+    args = arg_parser.parse_args(argv)
+
+    profile = profiling.Profile()
+    results = replay(read_entries(args.logs), args.repeat, profile)
+    results.sort(key=lambda item: -item[1])
+    print(
+        "%10s %10s %8s %6s  %s"
+        % ("logged (s)", "replay (s)", "chars", "quant", "text")
+    )
+    for entry, seconds, quantities in results[: args.top]:
+        print(
+            "%10.4f %10.4f %8d %6d  %s"
+            % (
+                entry.get("seconds", 0.0),
+                seconds,
+                len(entry["text"]),
+                quantities,
+                json.dumps(entry["text"][:60], ensure_ascii=False),
+            )
+        )
+    print("%d documents, %.4f s in total (best of %d)" % (
+        len(results), sum(item[1] for item in results), args.repeat
+    ))
+    print(profile.report())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "documents": [
+                        {
+                            "text": entry["text"],
+                            "lang": entry.get("lang", const.LANG),
+                            "logged_seconds": entry.get("seconds"),
+                            "seconds": seconds,
+                            "quantities": quantities,
+                        }
+                        for entry, seconds, quantities in results
+                    ],
+                    "stages": profile.as_dict(),
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+:mod:`Quantulum` unit tagger, unit mentions without values.
+"""
+
+import re
+from typing import List
+
+from . import classes as cls
+from . import disambiguate as dis
+from . import const, load, parser, profiling
+from . import regex as reg
+
+# Most units of one mention, as in the unit patterns
+MAX_UNITS = 4
+# Most digits of a power, larger ones are not units of a text
+MAX_POWER_DIGITS = 3
+# Longest surfaces of one word, like "giờ" or "độ", only read as units after
+# a number, like symbols made of letters
+MAX_SHORT_WORD = 5
+# Symbols only read as units after a number, besides those made of letters
+QUOTE_SYMBOLS = {"'", '"', "”", "′", "″"}
+
+# Where a unit may start: words not within a word, and other non-spaces
+_START = re.compile(r"(?<![^\W\d_])\w|[^\w\s]")
+
+
+###############################################################################
+class UnitIndex(object):
+    """
+    Character trie over the lower case surfaces and symbols of the units of
+    a language.
+    """
+
+    def __init__(self, units):
+        """
+        :param units: load.Units of the language
+        """
+        # Lookups must not add keys, the indexes of load are defaultdicts
+        self.surfaces = set(key for key, value in units.surfaces_lower.items() if value)
+        self.symbols = set(key for key, value in units.symbols.items() if value)
+        # Symbols like "$", followed by a value rather than a power
+        self.prefixes = set(key for key, value in units.prefix_symbols.items() if value)
+        self.trie = {}
+        self.longest = 0
+        for key in self.surfaces.union(symbol.lower() for symbol in self.symbols):
+            node = self.trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[""] = True
+            self.longest = max(self.longest, len(key))
+
+    def __repr__(self):
+
+        msg = "UnitIndex(surfaces=%d, symbols=%d)"
+        msg = msg % (len(self.surfaces), len(self.symbols))
+        return msg
+
+    def ends(self, lowered, start):
+        """
+        Ends of the keys found at start of the lower case text, shortest first.
+        """
+        node, ends = self.trie, []
+        for index in range(start, min(len(lowered), start + self.longest)):
+            node = node.get(lowered[index])
+            if node is None:
+                break
+            if "" in node:
+                ends.append(index + 1)
+        return ends
+
+
+def _layer_unit_index(registry, base, lang=const.LANG):
+    # Registries without custom units share the index of the process
+    return UnitIndex(load.units(lang)) if registry.units else base
+
+
+@load.scoped(_layer_unit_index)
+def unit_index(lang=const.LANG):
+    """
+    Cached index of the units of a language and the active registry, dropped
+    whenever custom units change.
+    """
+    return UnitIndex(load.units(lang))
+
+
+def _lower(text):
+    """
+    Lower case text with the offsets of text.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+###############################################################################
+class UnitTagger(object):
+    """
+    Finds units mentioned without values, like "km/h" or "mét vuông", e.g. to
+    tag search queries. Unlike parse with has_value=False, which runs the full
+    unit patterns, it looks surfaces and symbols up in a precompiled index in
+    one pass over the text, in time linear in its length. Symbols are case
+    sensitive, surfaces are not.
+
+        >>> tagger = UnitTagger()
+        >>> tagger.tag("đổi km/h sang m/s")
+    """
+
+    def __init__(self, lang=const.LANG, bare_symbols=False, registry=None):
+        """
+        :param bare_symbols: also tag symbols made of letters or quotes, like
+                             "in" or "A", and short words, like "giờ", when
+                             no number comes before them
+        :param registry: optional registry.Registry of custom units
+        """
+        self.lang = lang
+        self.bare_symbols = bare_symbols
+        self.registry = registry
+        # Spaces alone do not join units without values
+        self.operators = sorted(
+            set(operator.strip() for operator in reg.operators(lang)) - {""},
+            key=len,
+            reverse=True,
+        )
+        self.division = set(operator.strip() for operator in reg.division_operators(lang))
+        superscripts = reg.unicode_superscript_regex()
+        self._exponent = re.compile(
+            reg.exponents_regex(lang).format(superscripts=superscripts), re.IGNORECASE
+        )
+        # Powers of one kind of digits, "h9³" is not hour^93
+        self._power_text = re.compile(
+            r"(?:\^?(-?(?:[0-9]{1,%d}|[%s]{1,%d})))?(?:\ (?:%s))?"
+            % (
+                MAX_POWER_DIGITS,
+                superscripts,
+                MAX_POWER_DIGITS,
+                "|".join(re.escape(power) for power in reg.powers(lang)),
+            ),
+            re.IGNORECASE,
+        )
+        self.warmup()
+
+    def __repr__(self):
+
+        msg = "UnitTagger(lang=%r, bare_symbols=%r)"
+        msg = msg % (self.lang, self.bare_symbols)
+        return msg
+
+    def warmup(self):
+        """
+        Load the units and build their index.
+        """
+        if self.registry is not None:
+            with self.registry.active():
+                return unit_index(self.lang)
+        return unit_index(self.lang)
+
+    @profiling.stage("tag")
+    def tag(self, text) -> List[cls.UnitMention]:
+        """
+        Find all unit mentions of a text.
+        :return: list of classes.UnitMention, ordered by span
+        """
+        if self.registry is not None:
+            with self.registry.active():
+                return self._tag(text)
+        return self._tag(text)
+
+    def _tag(self, text):
+        index = unit_index(self.lang)
+        lowered = _lower(text)
+        mentions, end = [], 0
+        for start in _START.finditer(lowered):
+            start = start.start()
+            if start < end or lowered[start] not in index.trie:
+                continue
+            mention = self._mention(index, text, lowered, start)
+            if mention is not None:
+                mentions.append(mention)
+                end = mention.span[1]
+        return mentions
+
+    def _mention(self, index, text, lowered, start):
+        """
+        Mention of up to MAX_UNITS units joined by operators at start.
+        """
+        dimensions, slash, evident = [], False, False
+        position, end, operator = start, start, None
+        while len(dimensions) < MAX_UNITS:
+            found = self._unit(index, text, lowered, position)
+            if found is None:
+                break
+            if operator is not None:
+                evident = evident or not operator.isalpha()
+                slash = slash or operator in self.division
+            key_end, end = found
+            surface, power = text[position:key_end], text[key_end:end]
+            dimensions.append(
+                {
+                    "base": dis.disambiguate_unit(surface, self.lang),
+                    "power": self._power(power, slash),
+                    "surface": surface,
+                }
+            )
+            evident = evident or self._evident(index, surface, power)
+            found = self._operator(text, lowered, end)
+            if found is None:
+                break
+            operator, position = found
+
+        if not dimensions:
+            return None
+        if not (
+            evident
+            or self.bare_symbols
+            or self._after_number(text, start)
+            or (surface in index.prefixes and self._before_number(text, end))
+        ):
+            return None
+        try:
+            unit = parser.get_unit_from_dimensions(dimensions, text, self.lang)
+        except OverflowError:
+            # Conversions of powers too large for floats
+            return None
+        return cls.UnitMention(unit, text[start:end], (start, end), self.lang)
+
+    def _unit(self, index, text, lowered, start):
+        """
+        Longest unit with its power at start.
+        :return: (end of the surface or symbol, end of the power) or None
+        """
+        for key_end in reversed(index.ends(lowered, start)):
+            if (
+                text[start:key_end] not in index.symbols
+                and lowered[start:key_end] not in index.surfaces
+            ):
+                continue
+            if text[start:key_end] in index.prefixes:
+                end = key_end
+                if end < len(text) and text[end - 1].isalnum() and text[end].isalpha():
+                    continue
+                return key_end, end
+            end = self._exponent.match(text, key_end).end()
+            if end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+                continue
+            if not self._power_text.fullmatch(text, key_end, end):
+                continue
+            return key_end, end
+        return None
+
+    def _operator(self, text, lowered, start):
+        """
+        Operator after a unit, with the spaces around it.
+        :return: (operator, start of the next unit) or None
+        """
+        index = start
+        while index < len(text) and text[index] == " ":
+            index += 1
+        for operator in self.operators:
+            if not lowered.startswith(operator, index):
+                continue
+            end = index + len(operator)
+            # Operators like "x" or "per" have to be words of their own
+            if operator.isalpha() and (
+                index == start or (end < len(text) and text[end].isalnum())
+            ):
+                continue
+            while end < len(text) and text[end] == " ":
+                end += 1
+            return operator, end
+        return None
+
+    def _power(self, power, slash):
+        digits = self._power_text.fullmatch(power).group(1)
+        if digits:
+            superscripts = reg.unicode_superscript()
+            exponent = int("".join(superscripts.get(char, char) for char in digits))
+        elif power:
+            exponent = reg.powers(self.lang)[power.strip().lower()]
+        else:
+            exponent = 1
+        return -exponent if slash else exponent
+
+    @staticmethod
+    def _evident(index, surface, power):
+        """
+        Whether a unit is one without a number, i.e. neither a symbol made of
+        letters or quotes, like "in", nor a short word, like "giờ" in "bây
+        giờ", nor one with a plain number as power.
+        """
+        if power and not power.isdecimal():
+            return True
+        letters = all(char.isalpha() or char == "." for char in surface)
+        if surface.lower() in index.surfaces:
+            return not letters or len(surface) > MAX_SHORT_WORD
+        return not letters and surface not in QUOTE_SYMBOLS
+
+    def _after_number(self, text, start):
+        """
+        Whether a number or a number word like "ba" comes right before start.
+        """
+        index = start - 1
+        while index >= 0 and text[index] == " ":
+            index -= 1
+        if index < 0:
+            return False
+        if text[index].isdigit() or text[index] in reg.unicode_fractions():
+            return True
+        word_start = index
+        while word_start > 0 and text[word_start - 1].isalpha():
+            word_start -= 1
+        word = text[word_start:index + 1].lower()
+        return bool(word) and word in reg.number_words(self.lang)
+
+    @staticmethod
+    def _before_number(text, end):
+        while end < len(text) and text[end] == " ":
+            end += 1
+        return end < len(text) and text[end].isdigit()
+
+
+###############################################################################
+def tag(text, lang=const.LANG, bare_symbols=False, registry=None):
+    """
+    Find all units mentioned without values in a text, see UnitTagger.
+    """
+    return UnitTagger(lang, bare_symbols, registry).tag(text)